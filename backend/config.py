@@ -9,14 +9,41 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 PDF_PATH = os.getenv("PDF_PATH", str(BASE_DIR / "data" / "raw" / "UET lahore Document.pdf"))
 PROCESSED_DATA_DIR = BASE_DIR / "data" / "processed"
 CHROMA_DB_DIR = BASE_DIR / "data" / "chroma_db"
+EMBEDDING_CACHE_DIR = PROCESSED_DATA_DIR / "embeddings"
 
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-mpnet-base-v2")
 LLM_MODEL = os.getenv("LLM_MODEL", "TinyLlama/TinyLlama-1.1B-Chat-v1.0")
+# Serve embeddings from a vLLM embedding engine instead of sentence-transformers.
+# Falls back to sentence-transformers when vLLM is unavailable.
+EMBEDDING_USE_VLLM = os.getenv("EMBEDDING_USE_VLLM", "False").lower() in ("1","true","yes")
+
+# Compile the transformers fallback model with torch.compile. Speeds up decode
+# but adds a slow first request while kernels are generated.
+LLM_TORCH_COMPILE = os.getenv("LLM_TORCH_COMPILE", "False").lower() in ("1","true","yes")
+
+# Optional small draft model (same tokenizer as LLM_MODEL) for speculative
+# decoding on the transformers path. Empty disables it; costs extra VRAM.
+LLM_DRAFT_MODEL = os.getenv("LLM_DRAFT_MODEL", "")
+
+# Query embeddings from concurrent /chat requests are coalesced into one
+# forward pass of at most EMBED_BATCH_SIZE texts, waiting up to
+# EMBED_BATCH_WAIT_MS for a batch to fill.
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+EMBED_BATCH_WAIT_MS = float(os.getenv("EMBED_BATCH_WAIT_MS", "5"))
 
 CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "250"))
 CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "50"))
 TOP_K_RETRIEVAL = int(os.getenv("TOP_K_RETRIEVAL", "3"))
 
+# Semantic cache in front of retrieval: results of a previous query are reused
+# when a new query embedding is at least this similar. Opt-in, since close
+# paraphrases get each other's documents; size 0 disables it.
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "0"))
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+# Exact query texts that keep their embedding so a repeat skips the embedder.
+# Size 0 disables it.
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024"))
+
 # Control whether strict metadata filters are applied during retrieval.
 # When False, retrieval uses pure semantic similarity which is often better
 # for semi-structured prospectus documents where strict metadata may be missing.
@@ -24,6 +51,9 @@ APPLY_METADATA_FILTER = os.getenv("APPLY_METADATA_FILTER", "False").lower() in (
 
 API_HOST = os.getenv("API_HOST", "0.0.0.0")
 API_PORT = int(os.getenv("API_PORT", "8000"))
+# Upper bound for one /chat request, kept below the clients' 60 s read timeout
+# so they get a clean 504 instead of a dropped connection.
+CHAT_TIMEOUT = float(os.getenv("CHAT_TIMEOUT", "55"))
 
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 
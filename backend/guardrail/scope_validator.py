@@ -1,17 +1,62 @@
+import functools
 import logging
 import re
+import string
 from typing import Tuple
 from backend.config import DEPARTMENT_KEYWORDS, GUARDRAIL_MESSAGE
 
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+_WORD_RE = re.compile(r'\b\w+\b')
+# ASCII punctuation -> space; '_' is a word character so it is kept
+_PUNCT_TO_SPACE = str.maketrans({char: ' ' for char in string.punctuation if char != '_'})
+
+
+def _tokenize(text_lower: str) -> list:
+    """Split text into \w+ words; plain split() for ASCII, the regex otherwise."""
+    if text_lower.isascii():
+        return text_lower.translate(_PUNCT_TO_SPACE).split()
+    return _WORD_RE.findall(text_lower)
+
+
+def _compile_keyword_pattern(keywords: list) -> re.Pattern:
+    """Compile keywords into one alternation that only matches whole words."""
+    # longest first so "programs" wins over "program" at the same position
+    alternation = '|'.join(re.escape(kw.lower()) for kw in sorted(set(keywords), key=len, reverse=True))
+    return re.compile(r'(?<!\w)(?:' + alternation + r')(?!\w)')
+
+
+def _partition_keywords(keywords_lower: list) -> Tuple[frozenset, list]:
+    """Split keywords into single tokens (hash lookups) and multi-token ones like "ph.d"."""
+    # a keyword is single-token exactly when the question tokenizer keeps it whole
+    single = frozenset(kw for kw in keywords_lower if _tokenize(kw) == [kw])
+    multi = list(dict.fromkeys(kw for kw in keywords_lower if kw not in single))
+    return single, multi
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == '_'
+
+
+_DEFAULT_SINGLE_KW, _DEFAULT_MULTI_KW = _partition_keywords([kw.lower() for kw in DEPARTMENT_KEYWORDS])
+_KW_RE = _compile_keyword_pattern(_DEFAULT_MULTI_KW)
+
+
 class ScopeValidator:
     def __init__(self, keywords: list = None, threshold: float = 0.15):
-        self.keywords = keywords or DEPARTMENT_KEYWORDS
+        self.keywords = list(keywords or DEPARTMENT_KEYWORDS)
         self.threshold = threshold
         self.keywords_lower = [kw.lower() for kw in self.keywords]
+        # memoize per instance so repeated questions (retries, FAQs, probes) skip the scan
+        self._match = functools.lru_cache(maxsize=1024)(self._match_question)
+        self._index_keywords()
         logger.info(f"Initialized ScopeValidator with {len(self.keywords)} keywords and threshold={threshold}")
 
     def is_department_related(self, question: str) -> Tuple[bool, float, str]:
@@ -19,16 +64,20 @@ class ScopeValidator:
             logger.warning("Empty question provided")
             return False, 0.0, "Empty question"
         
+        is_related, match_score, reason = self._match(question)
+        
+        logger.info(f"Question validation: is_related={is_related}, score={match_score:.3f}, reason={reason}")
+        
+        return is_related, match_score, reason
+
+    def _match_question(self, question: str) -> Tuple[bool, float, str]:
         question_lower = question.lower()
-        question_words = re.findall(r'\b\w+\b', question_lower)
+        question_words = _tokenize(question_lower)
         
         if not question_words:
             return False, 0.0, "No valid words in question"
         
-        keyword_matches = []
-        for keyword in self.keywords_lower:
-            if keyword in question_lower:
-                keyword_matches.append(keyword)
+        keyword_matches = self._find_keywords(question_lower, question_words)
         
         match_score = len(keyword_matches) / len(question_words)
         
@@ -36,8 +85,6 @@ class ScopeValidator:
         
         reason = f"Matched {len(keyword_matches)} keywords: {keyword_matches[:5]}" if keyword_matches else "No keyword matches"
         
-        logger.info(f"Question validation: is_related={is_related}, score={match_score:.3f}, reason={reason}")
-        
         return is_related, match_score, reason
 
     def validate_and_respond(self, question: str) -> Tuple[bool, str]:
@@ -50,15 +97,60 @@ class ScopeValidator:
         logger.info(f"Question accepted: {reason}")
         return True, ""
 
+    def _index_keywords(self):
+        """(Re)build the keyword lookup structures from keywords_lower."""
+        if self.keywords == DEPARTMENT_KEYWORDS:
+            self._kw_set, self._multi_keywords = _DEFAULT_SINGLE_KW, _DEFAULT_MULTI_KW
+            self.keyword_pattern = _KW_RE
+        else:
+            self._kw_set, self._multi_keywords = _partition_keywords(self.keywords_lower)
+            self.keyword_pattern = _compile_keyword_pattern(self._multi_keywords) if self._multi_keywords else None
+        self.automaton = self._build_automaton()
+        self._match.cache_clear()
+
+    def _build_automaton(self):
+        """Build an Aho-Corasick automaton over the multi-token keywords (None if unavailable)."""
+        if ahocorasick is None or not self._multi_keywords:
+            return None
+        automaton = ahocorasick.Automaton()
+        for keyword in self._multi_keywords:
+            automaton.add_word(keyword, keyword)
+        automaton.make_automaton()
+        return automaton
+
+    def _find_keywords(self, question_lower: str, question_words: list) -> list:
+        """Return the distinct whole-word keywords found in the question."""
+        # single-token keywords: one hash lookup per question word
+        matches = [word for word in question_words if word in self._kw_set]
+
+        if self.automaton is not None:
+            # drop hits embedded in a longer word ("ph.d" inside "ph.ds")
+            for end, kw in self.automaton.iter(question_lower):
+                start = end - len(kw) + 1
+                if start > 0 and _is_word_char(question_lower[start - 1]):
+                    continue
+                if end + 1 < len(question_lower) and _is_word_char(question_lower[end + 1]):
+                    continue
+                matches.append(kw)
+        elif self.keyword_pattern is not None:
+            matches.extend(self.keyword_pattern.findall(question_lower))
+
+        return list(dict.fromkeys(matches))
+
     def add_keywords(self, new_keywords: list):
         self.keywords.extend(new_keywords)
         self.keywords_lower = [kw.lower() for kw in self.keywords]
+        self._index_keywords()
         logger.info(f"Added {len(new_keywords)} new keywords. Total: {len(self.keywords)}")
 
 
+@functools.lru_cache(maxsize=1)
+def _get_validator() -> ScopeValidator:
+    return ScopeValidator()
+
+
 def validate_question(question: str) -> Tuple[bool, str]:
-    validator = ScopeValidator()
-    return validator.validate_and_respond(question)
+    return _get_validator().validate_and_respond(question)
 
 
 if __name__ == "__main__":
@@ -1,14 +1,16 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Union
+import asyncio
 import logging
+import orjson
 import uvicorn
 from contextlib import asynccontextmanager
 import warnings
 
-from backend.rag.answer_generator import AnswerGenerator
-from backend.config import API_HOST, API_PORT, LOG_LEVEL
+from backend.config import API_HOST, API_PORT, LOG_LEVEL, EMBED_BATCH_SIZE, EMBED_BATCH_WAIT_MS, CHAT_TIMEOUT
 
 logging.basicConfig(
     level=getattr(logging, LOG_LEVEL),
@@ -27,7 +29,17 @@ async def lifespan(app: FastAPI):
     global answer_generator
     logger.info("Starting up UET RAG API...")
     try:
+        # imported here so importing the app (e.g. in API tests) skips torch and the models
+        from backend.rag.answer_generator import AnswerGenerator
+        from backend.preprocessing.embedder import EmbeddingBatcher
+        
         answer_generator = AnswerGenerator(use_vllm=False)
+        retriever = answer_generator.retriever
+        retriever.embedder = EmbeddingBatcher(
+            retriever.embedder,
+            max_batch_size=EMBED_BATCH_SIZE,
+            max_wait_ms=EMBED_BATCH_WAIT_MS
+        )
         logger.info("Answer generator initialized successfully")
     except Exception as e:
         logger.error(f"Failed to initialize answer generator: {str(e)}")
@@ -36,13 +48,20 @@ async def lifespan(app: FastAPI):
     yield
     
     logger.info("Shutting down UET RAG API...")
+    retriever.embedder.close()
+
+
+def get_answer_generator():
+    """The AnswerGenerator built at startup, or None; API tests override this with a stub."""
+    return answer_generator
 
 
 app = FastAPI(
     title="UET Department RAG API",
     description="RAG-based chatbot for UET department information",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 app.add_middleware(
@@ -65,6 +84,17 @@ class ChatRequest(BaseModel):
     top_k: Optional[int] = Field(default=5, description="Number of documents to retrieve")
     max_tokens: Optional[int] = Field(default=512, description="Maximum tokens for response")
     temperature: Optional[float] = Field(default=0.7, description="Temperature for generation")
+    citations_preview_chars: Optional[int] = Field(default=None, description="Truncate each citation to this many characters")
+    include_sources: Optional[bool] = Field(default=True, description="Include source metadata in the response")
+
+
+class BatchChatRequest(BaseModel):
+    messages: List[str] = Field(..., description="Questions to answer together")
+    top_k: Optional[int] = Field(default=5, description="Number of documents to retrieve")
+    max_tokens: Optional[int] = Field(default=512, description="Maximum tokens for each response")
+    temperature: Optional[float] = Field(default=0.7, description="Temperature for generation")
+    citations_preview_chars: Optional[int] = Field(default=None, description="Truncate each citation to this many characters")
+    include_sources: Optional[bool] = Field(default=True, description="Include source metadata in the responses")
 
 
 class Citation(BaseModel):
@@ -80,6 +110,19 @@ class ChatResponse(BaseModel):
     metadata: Dict
 
 
+class BatchChatResponse(BaseModel):
+    results: List[ChatResponse]
+
+
+def trim_result(result: Dict, request: Union[ChatRequest, BatchChatRequest]) -> Dict:
+    """Apply the request's citation preview length and sources opt-out before serializing."""
+    if request.citations_preview_chars is not None:
+        result['citations'] = [citation[:request.citations_preview_chars] for citation in result.get('citations', [])]
+    if not request.include_sources:
+        result['sources'] = []
+    return result
+
+
 @app.get("/")
 async def root():
     return {
@@ -87,6 +130,7 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "POST /chat": "Send a question and get an answer",
+            "POST /chat/batch": "Send several questions and get their answers in one call",
             "GET /health": "Check API health status",
             "GET /docs": "API documentation"
         }
@@ -94,7 +138,7 @@ async def root():
 
 
 @app.get("/health")
-async def health_check():
+async def health_check(answer_generator=Depends(get_answer_generator)):
     try:
         if answer_generator is None:
             return {
@@ -121,7 +165,7 @@ async def health_check():
 
 
 @app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, answer_generator=Depends(get_answer_generator)):
     try:
         if answer_generator is None:
             raise HTTPException(
@@ -137,13 +181,25 @@ async def chat(request: ChatRequest):
         
         logger.info(f"Received chat request: '{request.message[:100]}...'")
         
-        result = answer_generator.generate_answer(
-            question=request.message,
-            top_k=request.top_k,
-            max_tokens=request.max_tokens,
-            temperature=request.temperature
-        )
+        # embedding and generation run off the event loop, so concurrent
+        # requests overlap and share embedding and vLLM batches
+        try:
+            result = await asyncio.wait_for(
+                answer_generator.agenerate_answer(
+                    question=request.message,
+                    top_k=request.top_k,
+                    max_tokens=request.max_tokens,
+                    temperature=request.temperature
+                ),
+                timeout=CHAT_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=504,
+                detail=f"Answer generation took longer than {CHAT_TIMEOUT:.0f}s"
+            )
         
+        result = trim_result(result, request)
         response = ChatResponse(
             answer=result['answer'],
             citations=result['citations'],
@@ -165,8 +221,98 @@ async def chat(request: ChatRequest):
         )
 
 
+@app.post("/chat/batch", response_model=BatchChatResponse)
+async def chat_batch(request: BatchChatRequest, answer_generator=Depends(get_answer_generator)):
+    """Answer several questions with one batched retrieval and one batched LLM call."""
+    try:
+        if answer_generator is None:
+            raise HTTPException(
+                status_code=503,
+                detail="Answer generator not initialized. Please check server logs."
+            )
+        
+        if not request.messages or any(not message or not message.strip() for message in request.messages):
+            raise HTTPException(
+                status_code=400,
+                detail="Messages cannot be empty"
+            )
+        
+        logger.info(f"Received batch chat request with {len(request.messages)} questions")
+        
+        try:
+            results = await asyncio.wait_for(
+                answer_generator.agenerate_answer_batch(
+                    request.messages,
+                    top_k=request.top_k,
+                    max_tokens=request.max_tokens,
+                    temperature=request.temperature
+                ),
+                timeout=CHAT_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=504,
+                detail=f"Answer generation took longer than {CHAT_TIMEOUT:.0f}s"
+            )
+        
+        return BatchChatResponse(results=[
+            ChatResponse(
+                answer=result['answer'],
+                citations=result['citations'],
+                sources=result['sources'],
+                metadata=result['metadata']
+            )
+            for result in (trim_result(result, request) for result in results)
+        ])
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error processing batch chat request: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Internal server error: {str(e)}"
+        )
+
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest, answer_generator=Depends(get_answer_generator)):
+    """Server-sent events: one `data: {"token": ...}` per generated piece, then a final
+    `data: {...}` event with the full answer, citations, sources and "done": true."""
+    if answer_generator is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Answer generator not initialized. Please check server logs."
+        )
+    
+    if not request.message or not request.message.strip():
+        raise HTTPException(
+            status_code=400,
+            detail="Message cannot be empty"
+        )
+    
+    logger.info(f"Received streaming chat request: '{request.message[:100]}...'")
+    
+    async def events():
+        async for event in answer_generator.astream_answer(
+            question=request.message,
+            top_k=request.top_k,
+            max_tokens=request.max_tokens,
+            temperature=request.temperature
+        ):
+            if event.get('done'):
+                event = trim_result(event, request)
+            yield b"data: " + orjson.dumps(event) + b"\n\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.get("/stats")
-async def get_stats():
+async def get_stats(answer_generator=Depends(get_answer_generator)):
     try:
         if answer_generator is None:
             raise HTTPException(status_code=503, detail="Service not initialized")
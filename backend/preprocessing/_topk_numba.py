@@ -0,0 +1,102 @@
+"""Numba top-k cosine kernel for the brute-force search fallback.
+
+Used by VectorStore for metadata-filtered scans, and for every scan when
+SimSIMD is not installed. Importing this module raises ImportError when
+numba itself is missing.
+"""
+import numba
+import numpy as np
+from llvmlite import ir
+from numba import njit, prange, types
+from numba.core import cgutils
+from numba.extending import intrinsic
+
+# rows fetched ahead of the one being scored; the scan is memory-bound
+PREFETCH_DISTANCE = 4
+CACHE_LINE = 64
+
+
+@intrinsic
+def _prefetch(typingctx, array, offset):
+    """Emit llvm.prefetch (read, no temporal locality) for array.ravel()[offset]."""
+    def codegen(context, builder, signature, args):
+        data, position = args
+        ary = context.make_array(signature.args[0])(context, builder, data)
+        i8p = ir.IntType(8).as_pointer()
+        i32 = ir.IntType(32)
+        fnty = ir.FunctionType(ir.VoidType(), [i8p, i32, i32, i32])
+        fn = cgutils.get_or_insert_function(builder.module, fnty, "llvm.prefetch.p0i8")
+        ptr = builder.bitcast(builder.gep(ary.data, [position]), i8p)
+        builder.call(fn, [ptr, i32(0), i32(0), i32(1)])
+        return context.get_dummy_value()
+
+    return types.void(array, offset), codegen
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _topk_cosine_int8(matrix, row_norms, query, rows, k, n_chunks, prefetch_distance):
+    n = rows.shape[0]
+    d = matrix.shape[1]
+    flat = matrix.ravel()
+
+    query_norm = 0.0
+    for j in range(d):
+        query_norm += np.float64(query[j]) * np.float64(query[j])
+    query_norm = max(np.sqrt(query_norm), 1e-12)
+
+    # every chunk keeps its own descending top-k, merged by the caller
+    best_sim = np.full((n_chunks, k), -np.inf, dtype=np.float32)
+    best_row = np.full((n_chunks, k), -1, dtype=np.int64)
+    chunk_size = (n + n_chunks - 1) // n_chunks
+
+    for c in prange(n_chunks):
+        start = c * chunk_size
+        stop = min(start + chunk_size, n)
+        for t in range(start, stop):
+            i = rows[t]
+            # pull every cache line of an upcoming row, not just the first
+            if prefetch_distance > 0 and t + prefetch_distance < stop:
+                ahead = rows[t + prefetch_distance] * d
+                for offset in range(0, d, CACHE_LINE):
+                    _prefetch(flat, ahead + offset)
+
+            # no early abort here: a bound check inside this loop stops LLVM
+            # from vectorizing it, which costs far more than pruning saves
+            dot = 0
+            for j in range(d):
+                dot += np.int32(matrix[i, j]) * np.int32(query[j])
+            sim = np.float32(dot / (max(row_norms[i], 1e-12) * query_norm))
+
+            if sim > best_sim[c, k - 1]:
+                pos = k - 1
+                while pos > 0 and best_sim[c, pos - 1] < sim:
+                    best_sim[c, pos] = best_sim[c, pos - 1]
+                    best_row[c, pos] = best_row[c, pos - 1]
+                    pos -= 1
+                best_sim[c, pos] = sim
+                best_row[c, pos] = i
+
+    return best_sim.ravel(), best_row.ravel()
+
+
+def topk_cosine_int8(matrix: np.ndarray, row_norms: np.ndarray, query: np.ndarray, rows: np.ndarray, k: int,
+                     prefetch_distance: int = PREFETCH_DISTANCE):
+    """Return (row indices, cosine distances) of the k best rows, best first."""
+    k = min(k, len(rows))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    n_chunks = max(1, min(numba.get_num_threads(), len(rows) // max(k, 256)))
+    # a contiguous run is already streamed by the hardware prefetcher
+    if rows[-1] - rows[0] + 1 == len(rows):
+        prefetch_distance = 0
+    sims, found = _topk_cosine_int8(
+        np.ascontiguousarray(matrix),
+        np.asarray(row_norms, dtype=np.float32),
+        np.ascontiguousarray(query, dtype=np.int8),
+        np.asarray(rows, dtype=np.int64),
+        k,
+        n_chunks,
+        prefetch_distance
+    )
+    order = np.argsort(-sims, kind="stable")[:k]
+    return found[order], (1.0 - sims[order]).astype(np.float32)
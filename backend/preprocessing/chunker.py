@@ -1,9 +1,60 @@
 import logging
-from typing import List
+import re
+from bisect import bisect_right
+from typing import Dict, List, Tuple
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# lowercase substring -> metadata flag it sets on a chunk
+METADATA_KEYWORDS = {
+    "eligibility": "has_eligibility",
+    "admission": "has_eligibility",
+    "requirement": "has_eligibility",
+    "offered programs": "has_programs",
+    "programs:": "has_programs",
+    "faculty": "has_faculty",
+    "professor": "has_faculty",
+    "dean": "has_faculty",
+    "introduction:": "has_introduction",
+    "established": "has_introduction",
+}
+METADATA_FLAGS = ("has_eligibility", "has_programs", "has_faculty", "has_introduction")
+
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+_SECTION_SPLIT_RE = re.compile(r'(?=(?:\bDepartment of\b|^\d+\.|^\d+\.|\n[A-Z][A-Z\s]{5,}\n))', re.M)
+_DEPARTMENT_RE = re.compile(r'Department of ([A-Z][a-z\s&]+(?:Engineering|Science|Management))')
+_METADATA_RE = re.compile('|'.join(re.escape(kw) for kw in sorted(METADATA_KEYWORDS, key=len, reverse=True)))
+# never appears in a keyword, so no match can straddle two chunks
+_CHUNK_SEPARATOR = "\x00"
+
+
+def _build_metadata_automaton():
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for keyword, flag in METADATA_KEYWORDS.items():
+        automaton.add_word(keyword, flag)
+    automaton.make_automaton()
+    return automaton
+
+
+_METADATA_AUTOMATON = _build_metadata_automaton()
+
+
+def _iter_metadata_hits(text_lower: str):
+    """Yield (position, flag) for every metadata keyword hit in one pass over the text."""
+    if _METADATA_AUTOMATON is not None:
+        yield from _METADATA_AUTOMATON.iter(text_lower)
+    else:
+        for match in _METADATA_RE.finditer(text_lower):
+            yield match.start(), METADATA_KEYWORDS[match.group(0)]
+
 
 class TextChunker:
     def __init__(self, chunk_size: int = 500, overlap: int = 100):
@@ -20,50 +71,62 @@ class TextChunker:
         total_words = len(words)
         logger.info(f"Chunking {total_words} words into chunks of {self.chunk_size} words with {self.overlap} word overlap")
         
-        chunks = []
-        start = 0
+        chunks = [' '.join(words[start:end]) for start, end in self.word_windows(total_words)]
         
-        while start < total_words:
+        logger.info(f"Created {len(chunks)} chunks from text")
+        return chunks
+
+    def word_windows(self, total_words: int) -> List[Tuple[int, int]]:
+        """Return the [start, end) word-index span of every chunk, without building any text."""
+        step = self.chunk_size - self.overlap
+        windows = []
+        for start in range(0, total_words, step):
             end = min(start + self.chunk_size, total_words)
-            chunk_words = words[start:end]
-            chunk_text = ' '.join(chunk_words)
-            chunks.append(chunk_text)
-            
+            windows.append((start, end))
             if end >= total_words:
                 break
-            
-            start += (self.chunk_size - self.overlap)
-        
-        logger.info(f"Created {len(chunks)} chunks from text")
-        return chunks
+        return windows
     
     def extract_metadata(self, chunk: str) -> dict:
         """Extract metadata from chunk to improve retrieval"""
-        metadata = {
-            "has_eligibility": "eligibility" in chunk.lower() or "admission" in chunk.lower() or "requirement" in chunk.lower(),
-            "has_programs": "offered programs" in chunk.lower() or "programs:" in chunk.lower(),
-            "has_faculty": "faculty" in chunk.lower() or "professor" in chunk.lower() or "dean" in chunk.lower(),
-            "has_introduction": "introduction:" in chunk.lower() or "established" in chunk.lower()
-        }
-        
-        import re
-        dept_match = re.search(r'Department of ([A-Z][a-z\s&]+(?:Engineering|Science|Management))', chunk)
-        if dept_match:
-            metadata["department"] = dept_match.group(1).strip()
-        
-        return metadata
+        return self.extract_metadata_batch([chunk])[0]
+
+    def extract_metadata_batch(self, chunks: List[str]) -> List[Dict]:
+        """Extract metadata for many chunks with a single keyword sweep.
+
+        The lowercased chunks are joined and scanned once; every hit is then
+        bucketed back into its chunk by bisecting the chunk start offsets.
+        """
+        lowered = [chunk.lower() for chunk in chunks]
+        starts = []
+        offset = 0
+        for chunk_lower in lowered:
+            starts.append(offset)
+            offset += len(chunk_lower) + len(_CHUNK_SEPARATOR)
+
+        hits = [set() for _ in chunks]
+        for position, flag in _iter_metadata_hits(_CHUNK_SEPARATOR.join(lowered)):
+            hits[bisect_right(starts, position) - 1].add(flag)
+
+        metadatas = []
+        for chunk, chunk_hits in zip(chunks, hits):
+            metadata = {flag: flag in chunk_hits for flag in METADATA_FLAGS}
+            dept_match = _DEPARTMENT_RE.search(chunk)
+            if dept_match:
+                metadata["department"] = dept_match.group(1).strip()
+            metadatas.append(metadata)
+        return metadatas
 
     def chunk_by_sentences(self, text: str) -> List[str]:
-        import re
-        sentences = re.split(r'(?<=[.!?])\s+', text)
+        sentences = _SENTENCE_SPLIT_RE.split(text)
         
         chunks = []
         current_chunk = []
         current_word_count = 0
         
         for sentence in sentences:
-            sentence_words = sentence.split()
-            sentence_word_count = len(sentence_words)
+            # split() rather than counting spaces: sentences may still contain newlines
+            sentence_word_count = len(sentence.split())
             
             if current_word_count + sentence_word_count <= self.chunk_size:
                 current_chunk.append(sentence)
@@ -86,25 +149,36 @@ class TextChunker:
         Splits on occurrences like 'Department of ...' and numbered section headings
         to keep sections coherent before applying sentence-based chunking.
         """
-        import re
-
         # Try to split into department/section blocks while keeping headers
-        sections = re.split(r'(?=(?:\bDepartment of\b|^\d+\.|^\d+\.|\n[A-Z][A-Z\s]{5,}\n))', text, flags=re.M)
+        sections = _SECTION_SPLIT_RE.split(text)
 
         # If split produced nothing useful, fall back to sentence chunking of whole text
         if not sections or len(sections) == 1:
             return self.chunk_by_sentences(text)
 
+        # sentence-chunk every section into one output list; the sentence
+        # buffer is shared and only flushed at section boundaries
         chunks = []
+        current_chunk = []
+        current_word_count = 0
         for sec in sections:
             sec = sec.strip()
             if not sec:
                 continue
-            # chunk each section by sentences to desired size
-            # temporarily set text to section and reuse sentence-based logic
-            section_chunks = self.chunk_by_sentences(sec)
-            for c in section_chunks:
-                chunks.append(c)
+            for sentence in _SENTENCE_SPLIT_RE.split(sec):
+                sentence_word_count = len(sentence.split())
+                
+                if current_word_count + sentence_word_count > self.chunk_size and current_chunk:
+                    chunks.append(' '.join(current_chunk))
+                    current_chunk.clear()
+                    current_word_count = 0
+                current_chunk.append(sentence)
+                current_word_count += sentence_word_count
+            
+            if current_chunk:
+                chunks.append(' '.join(current_chunk))
+                current_chunk.clear()
+                current_word_count = 0
 
         logger.info(f"Created {len(chunks)} section-aware sentence chunks")
         return chunks
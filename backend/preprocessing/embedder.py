@@ -1,4 +1,8 @@
 import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
 from typing import List
 import numpy as np
 from sentence_transformers import SentenceTransformer
@@ -9,8 +13,9 @@ logger = logging.getLogger(__name__)
 
 
 class TextEmbedder:
-    def __init__(self, model_name: str = "sentence-transformers/all-mpnet-base-v2"):
+    def __init__(self, model_name: str = "sentence-transformers/all-mpnet-base-v2", use_vllm: bool = False):
         self.model_name = model_name
+        self.use_vllm = use_vllm
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         logger.info(f"Loading embedding model: {model_name}")
         logger.info(f"Using device: {self.device}")
@@ -19,30 +24,75 @@ class TextEmbedder:
             logger.info(f"GPU: {torch.cuda.get_device_name(0)}")
             logger.info(f"GPU Memory: {torch.cuda.get_device_properties(0).total_memory / 1024**3:.2f} GB")
         
+        if use_vllm:
+            self._initialize_vllm()
+        else:
+            self._initialize_sentence_transformers()
+
+    def _initialize_vllm(self):
         try:
-            self.model = SentenceTransformer(model_name, device=self.device)
+            from vllm import LLM
+            
+            logger.info("Initializing vLLM embedding engine...")
+            self.model = LLM(model=self.model_name, task="embed", dtype="float16")
+            logger.info("vLLM embedding engine initialized successfully")
+            
+        except ImportError:
+            logger.warning("vLLM not available, falling back to sentence-transformers")
+            self.use_vllm = False
+            self._initialize_sentence_transformers()
+        except Exception as e:
+            logger.error(f"Error initializing vLLM embedding engine: {str(e)}")
+            logger.warning("Falling back to sentence-transformers")
+            self.use_vllm = False
+            self._initialize_sentence_transformers()
+
+    def _initialize_sentence_transformers(self):
+        try:
+            self.model = SentenceTransformer(self.model_name, device=self.device)
+            if self.device == "cuda":
+                self.model = self.model.half()
             logger.info(f"Successfully loaded embedding model on {self.device}")
         except Exception as e:
             logger.error(f"Error loading embedding model: {str(e)}")
             raise
 
+    def encode(self, texts, **kwargs) -> np.ndarray:
+        """Encode to unit-length float32 vectors, so dot product equals cosine similarity."""
+        if self.use_vllm:
+            return self._encode_vllm(texts, show_progress=kwargs.get("show_progress_bar", False))
+        embeddings = self.model.encode(
+            texts,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            **kwargs
+        )
+        return embeddings.astype(np.float32, copy=False)
+
+    def _encode_vllm(self, texts, show_progress: bool = False) -> np.ndarray:
+        # vLLM schedules the whole list itself, so it is submitted in one call
+        single = isinstance(texts, str)
+        outputs = self.model.embed([texts] if single else texts, use_tqdm=show_progress)
+        embeddings = np.array([output.outputs.embedding for output in outputs], dtype=np.float32)
+        embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        return embeddings[0] if single else embeddings
+
     def embed_text(self, text: str) -> np.ndarray:
         try:
-            embedding = self.model.encode(text, convert_to_numpy=True)
-            logger.debug(f"Generated embedding of shape {embedding.shape}")
+            embedding = self.encode(text)
+            logger.debug("Generated embedding of shape %s", embedding.shape)
             return embedding
         except Exception as e:
             logger.error(f"Error generating embedding: {str(e)}")
             raise
 
-    def embed_batch(self, texts: List[str], batch_size: int = 64, show_progress: bool = True) -> List[np.ndarray]:
+    def embed_batch(self, texts: List[str], batch_size: int = 64, show_progress: bool = True) -> np.ndarray:
         try:
             logger.info(f"Generating embeddings for {len(texts)} texts")
-            embeddings = self.model.encode(
+            embeddings = self.encode(
                 texts,
                 batch_size=batch_size,
-                show_progress_bar=show_progress,
-                convert_to_numpy=True
+                show_progress_bar=show_progress
             )
             logger.info(f"Successfully generated {len(embeddings)} embeddings")
             return embeddings
@@ -51,10 +101,96 @@ class TextEmbedder:
             raise
 
     def get_embedding_dimension(self) -> int:
+        if self.use_vllm:
+            return self.model.llm_engine.model_config.get_hidden_size()
         return self.model.get_sentence_embedding_dimension()
 
 
-def embed_texts(texts: List[str], model_name: str = "sentence-transformers/all-MiniLM-L6-v2") -> List[np.ndarray]:
+class EmbeddingBatcher:
+    """Coalesce concurrent embed_text calls into batched model.encode calls.
+
+    Each caller enqueues its text and blocks on a future; a worker thread
+    drains up to max_batch_size texts (waiting at most max_wait_ms for the
+    batch to fill) and encodes them in a single forward pass. Everything
+    else is delegated to the wrapped TextEmbedder.
+    """
+
+    def __init__(self, embedder: TextEmbedder, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.embedder = embedder
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        # guards _closed so nothing is enqueued behind the shutdown sentinel
+        self._lock = threading.Lock()
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+        logger.info(f"Embedding batcher started (max_batch_size={max_batch_size}, max_wait_ms={max_wait_ms})")
+
+    def __getattr__(self, name):
+        return getattr(self.embedder, name)
+
+    def embed_text(self, text: str) -> np.ndarray:
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Embedding batcher is closed")
+            self._queue.put((text, future))
+        return future.result()
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._worker.join()
+        # the worker stops at the sentinel; fail anything it left behind
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[1].set_exception(RuntimeError("Embedding batcher is closed"))
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._encode(batch)
+
+    def _encode(self, batch):
+        texts = [text for text, _ in batch]
+        try:
+            embeddings = self.embedder.encode(texts, batch_size=len(texts))
+        except Exception as e:
+            logger.error(f"Error generating batched embeddings: {str(e)}")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        logger.debug("Encoded micro-batch of %d queries", len(texts))
+        for (_, future), embedding in zip(batch, embeddings):
+            future.set_result(embedding)
+
+
+def embed_texts(texts: List[str], model_name: str = "sentence-transformers/all-MiniLM-L6-v2") -> np.ndarray:
     embedder = TextEmbedder(model_name=model_name)
     return embedder.embed_batch(texts)
 
@@ -71,4 +207,4 @@ if __name__ == "__main__":
     
     embeddings = embedder.embed_batch(sample_texts)
     print(f"Generated {len(embeddings)} embeddings")
-    print(f"First embedding shape: {embeddings[0].shape}")
+    print(f"Embedding matrix shape: {embeddings.shape}")
@@ -0,0 +1,99 @@
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import List, Tuple
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """Content-addressed on-disk cache of chunk embeddings.
+
+    Entries are keyed by blake2b(model_name + NUL + text), so re-running the
+    pipeline only embeds chunks that are new or have changed. All vectors
+    live in one contiguous (N, D) matrix (embeddings.npy, float16 unless
+    `dtype` says otherwise) whose row order is given by embedding_keys.json;
+    it is opened with mmap so rows are only paged in when read.
+    """
+
+    MATRIX_FILE = "embeddings.npy"
+    KEYS_FILE = "embedding_keys.json"
+
+    def __init__(self, cache_dir: str, model_name: str, dtype=np.float16):
+        self.cache_dir = Path(cache_dir)
+        self.model_name = model_name
+        self.dtype = np.dtype(dtype)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.matrix_path = self.cache_dir / self.MATRIX_FILE
+        self.keys_path = self.cache_dir / self.KEYS_FILE
+
+    def key(self, text: str) -> str:
+        # the NUL separator keeps ("model-a", "bc") and ("model-ab", "c") apart
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(self.model_name.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def load_matrix(self) -> Tuple[np.ndarray, List[str]]:
+        """Return the memory-mapped matrix and the key of each row."""
+        if not (self.matrix_path.exists() and self.keys_path.exists()):
+            return None, []
+        with open(self.keys_path, "r", encoding="utf-8") as f:
+            keys = json.load(f)
+        matrix = np.load(self.matrix_path, mmap_mode="r")
+        if matrix.shape[0] != len(keys) or matrix.dtype != self.dtype:
+            logger.warning(f"Embedding cache at {self.cache_dir} is inconsistent, ignoring it")
+            return None, []
+        return matrix, keys
+
+    def embed(self, embedder, texts: List[str], batch_size: int = 64, show_progress: bool = True) -> np.ndarray:
+        keys = [self.key(text) for text in texts]
+        cached_matrix, cached_keys = self.load_matrix()
+        cached_rows = {key: row for row, key in enumerate(cached_keys)}
+
+        missing = [i for i, key in enumerate(keys) if key not in cached_rows]
+        logger.info(f"Embedding cache: {len(texts) - len(missing)} hits, {len(missing)} misses")
+
+        if cached_matrix is not None and not missing and cached_keys == keys:
+            return np.asarray(cached_matrix, dtype=np.float32)
+
+        dimension = cached_matrix.shape[1] if cached_matrix is not None else embedder.get_embedding_dimension()
+        matrix = np.empty((len(texts), dimension), dtype=self.dtype)
+        hits = [i for i, key in enumerate(keys) if key in cached_rows]
+        if hits:
+            matrix[hits] = cached_matrix[[cached_rows[keys[i]] for i in hits]]
+
+        if missing:
+            try:
+                new_embeddings = embedder.embed_batch(
+                    [texts[i] for i in missing],
+                    batch_size=batch_size,
+                    show_progress=show_progress
+                )
+                matrix[missing] = new_embeddings
+            except Exception as e:
+                logger.error(f"Error filling embedding cache: {str(e)}")
+                raise
+
+        del cached_matrix
+        self._save(matrix, keys)
+        return matrix.astype(np.float32)
+
+    def _save(self, matrix: np.ndarray, keys: List[str]):
+        # write to temporary files first so a crash never leaves a torn cache;
+        # the pid keeps processes sharing the directory (pytest -n) apart
+        suffix = f".{os.getpid()}.tmp"
+        tmp_matrix = self.matrix_path.with_name(self.MATRIX_FILE + suffix)
+        tmp_keys = self.keys_path.with_name(self.KEYS_FILE + suffix)
+        with open(tmp_matrix, "wb") as f:
+            np.save(f, np.ascontiguousarray(matrix))
+        with open(tmp_keys, "w", encoding="utf-8") as f:
+            json.dump(keys, f)
+        os.replace(tmp_matrix, self.matrix_path)
+        os.replace(tmp_keys, self.keys_path)
+        logger.info(f"Saved {matrix.shape[0]} embeddings to {self.matrix_path}")
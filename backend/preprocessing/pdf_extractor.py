@@ -1,33 +1,78 @@
 import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Optional
-import PyPDF2
+from typing import List, Optional
+import pypdfium2 as pdfium
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# below this many pages a worker pool costs more than it saves
+MIN_PAGES_FOR_POOL = 16
+
+
+def _extract_page_range(pdf_path: str, start: int, stop: int) -> List[str]:
+    """Extract pages [start, stop) in a worker process.
+
+    PDFium documents cannot be pickled, so every worker reopens the file.
+    """
+    pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        texts = []
+        for index in range(start, stop):
+            page = pdf[index]
+            textpage = page.get_textpage()
+            texts.append(textpage.get_text_range().replace("\r\n", "\n"))
+            textpage.close()
+            page.close()
+        return texts
+    finally:
+        pdf.close()
+
 
 class PDFExtractor:
-    def __init__(self, pdf_path: str):
+    def __init__(self, pdf_path: str, max_workers: Optional[int] = None):
         self.pdf_path = Path(pdf_path)
         if not self.pdf_path.exists():
             raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+        self.max_workers = max_workers or os.cpu_count() or 1
         logger.info(f"Initialized PDFExtractor with file: {pdf_path}")
 
+    def _page_count(self) -> int:
+        pdf = pdfium.PdfDocument(str(self.pdf_path))
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+
+    def _iter_page_texts(self, num_pages: int):
+        """Yield page texts in document order, extracting page ranges in parallel."""
+        workers = min(self.max_workers, num_pages)
+        if workers <= 1 or num_pages < MIN_PAGES_FOR_POOL:
+            yield from _extract_page_range(str(self.pdf_path), 0, num_pages)
+            return
+
+        step = -(-num_pages // workers)
+        bounds = [(start, min(start + step, num_pages)) for start in range(0, num_pages, step)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_extract_page_range, str(self.pdf_path), start, stop) for start, stop in bounds]
+            for future in futures:
+                yield from future.result()
+
     def extract_text(self) -> str:
         try:
-            text = ""
-            with open(self.pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                num_pages = len(pdf_reader.pages)
-                logger.info(f"Extracting text from {num_pages} pages")
-                
-                for page_num, page in enumerate(pdf_reader.pages, 1):
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
-                    logger.debug(f"Extracted page {page_num}/{num_pages}")
+            parts = []
+            num_pages = self._page_count()
+            logger.info(f"Extracting text from {num_pages} pages")
             
+            for page_num, page_text in enumerate(self._iter_page_texts(num_pages), 1):
+                if page_text:
+                    parts.append(page_text)
+                    parts.append("\n")
+                logger.debug("Extracted page %d/%d", page_num, num_pages)
+            
+            text = "".join(parts)
             logger.info(f"Successfully extracted {len(text)} characters from PDF")
             return text
         except Exception as e:
@@ -37,15 +82,12 @@ class PDFExtractor:
     def extract_text_by_pages(self) -> list[str]:
         try:
             pages = []
-            with open(self.pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                num_pages = len(pdf_reader.pages)
-                
-                for page_num, page in enumerate(pdf_reader.pages, 1):
-                    page_text = page.extract_text()
-                    if page_text:
-                        pages.append(page_text)
-                    logger.debug(f"Extracted page {page_num}/{num_pages}")
+            num_pages = self._page_count()
+            
+            for page_num, page_text in enumerate(self._iter_page_texts(num_pages), 1):
+                if page_text:
+                    pages.append(page_text)
+                logger.debug("Extracted page %d/%d", page_num, num_pages)
             
             logger.info(f"Successfully extracted {len(pages)} pages from PDF")
             return pages
@@ -5,11 +5,12 @@ import warnings
 
 sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
 
-from backend.config import PDF_PATH, CHROMA_DB_DIR, CHUNK_SIZE, CHUNK_OVERLAP, EMBEDDING_MODEL
+from backend.config import PDF_PATH, CHROMA_DB_DIR, CHUNK_SIZE, CHUNK_OVERLAP, EMBEDDING_MODEL, EMBEDDING_CACHE_DIR, EMBEDDING_USE_VLLM
 from backend.preprocessing.pdf_extractor import PDFExtractor
 from backend.preprocessing.text_cleaner import TextCleaner
 from backend.preprocessing.chunker import TextChunker
 from backend.preprocessing.embedder import TextEmbedder
+from backend.preprocessing.embedding_cache import EmbeddingCache
 from backend.preprocessing.vector_store import VectorStore
 
 logging.basicConfig(
@@ -45,7 +46,7 @@ def run_preprocessing_pipeline():
         logger.info(f"Created {len(chunks)} chunks")
         
         logger.info(f"\nStep 4: Generating embeddings using {EMBEDDING_MODEL}")
-        embedder = TextEmbedder(model_name=EMBEDDING_MODEL)
+        embedder = TextEmbedder(model_name=EMBEDDING_MODEL, use_vllm=EMBEDDING_USE_VLLM)
         logger.info(f"Embedding dimension: {embedder.get_embedding_dimension()}")
         
         logger.info(f"\nStep 5: Storing chunks in ChromaDB at {CHROMA_DB_DIR}")
@@ -54,15 +55,14 @@ def run_preprocessing_pipeline():
         vector_store.reset_collection()
 
         # Precompute embeddings for all chunks and pass them to Chroma
-        metadatas = []
-        for i, chunk in enumerate(chunks):
-            metadata = chunker.extract_metadata(chunk)
+        metadatas = chunker.extract_metadata_batch(chunks)
+        for i, metadata in enumerate(metadatas):
             metadata["chunk_id"] = i
             metadata["source"] = "uet_document"
-            metadatas.append(metadata)
 
-        # generate embeddings in batches
-        embeddings = embedder.embed_batch(chunks, batch_size=64, show_progress=True)
+        # generate embeddings in batches, reusing cached vectors for unchanged chunks
+        embedding_cache = EmbeddingCache(EMBEDDING_CACHE_DIR, EMBEDDING_MODEL)
+        embeddings = embedding_cache.embed(embedder, chunks, batch_size=64, show_progress=True)
 
         vector_store.add_documents(
             documents=chunks,
@@ -5,6 +5,18 @@ from typing import Optional
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Every char outside [\w\s] and the allowed punctuation becomes a space, and
+# runs of spaces/tabs collapse to one. Both steps are fused into a single class:
+# negating \w, the allowed punctuation and every whitespace char *except*
+# space/tab matches exactly "special char or horizontal whitespace".
+_RE_SPECIAL_WS = re.compile(
+    r'[^\w\.\,\;\:\?\!\-\(\)\[\]\{\}\/\'\"\%\$\#\@\&\+\=\*'
+    r'\n\x0b\x0c\r\x1c-\x1f\x85\xa0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000]+'
+)
+_RE_NL = re.compile(r'\n\s*\n\s*\n+')
+_RE_HYPH = re.compile(r'(\w)-\s+(\w)')
+_RE_PUNCT_SP = re.compile(r'\s+([.,;:!?])')
+
 
 class TextCleaner:
     def __init__(self):
@@ -17,30 +29,22 @@ class TextCleaner:
         
         original_length = len(text)
         
-        cleaned_text = self._remove_special_characters(text)
-        cleaned_text = self._normalize_whitespace(cleaned_text)
+        cleaned_text = self._remove_special_characters_and_spaces(text)
         cleaned_text = self._remove_extra_newlines(cleaned_text)
         cleaned_text = self._fix_common_ocr_errors(cleaned_text)
         
         logger.info(f"Cleaned text: {original_length} -> {len(cleaned_text)} characters")
         return cleaned_text.strip()
 
-    def _remove_special_characters(self, text: str) -> str:
-        text = re.sub(r'[^\w\s\.\,\;\:\?\!\-\(\)\[\]\{\}\/\'\"\%\$\#\@\&\+\=\*]', ' ', text)
-        return text
-
-    def _normalize_whitespace(self, text: str) -> str:
-        text = re.sub(r'[ \t]+', ' ', text)
-        return text
+    def _remove_special_characters_and_spaces(self, text: str) -> str:
+        return _RE_SPECIAL_WS.sub(' ', text)
 
     def _remove_extra_newlines(self, text: str) -> str:
-        text = re.sub(r'\n\s*\n\s*\n+', '\n\n', text)
-        return text
+        return _RE_NL.sub('\n\n', text)
 
     def _fix_common_ocr_errors(self, text: str) -> str:
-        text = re.sub(r'(\w)-\s+(\w)', r'\1\2', text)
-        text = re.sub(r'\s+([.,;:!?])', r'\1', text)
-        return text
+        text = _RE_HYPH.sub(r'\1\2', text)
+        return _RE_PUNCT_SP.sub(r'\1', text)
 
 
 def clean_text(text: str) -> str:
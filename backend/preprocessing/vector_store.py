@@ -1,4 +1,8 @@
+import hashlib
+import json
 import logging
+import mmap
+import os
 from typing import List, Dict, Optional
 import chromadb
 from chromadb.config import Settings
@@ -6,6 +10,16 @@ from pathlib import Path
 import warnings
 import numpy as np
 
+try:
+    import simsimd
+except ImportError:
+    simsimd = None
+
+try:
+    from backend.preprocessing._topk_numba import topk_cosine_int8
+except ImportError:
+    topk_cosine_int8 = None
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -13,11 +27,57 @@ logging.getLogger("chromadb.telemetry.product.posthog").setLevel(logging.CRITICA
 warnings.filterwarnings("ignore", category=DeprecationWarning, module="chromadb")
 
 
+def _quantize_int8(matrix: np.ndarray):
+    """Symmetric per-row int8 quantization; returns (int8 matrix, float32 row scales)."""
+    scales = np.maximum(np.abs(matrix).max(axis=1), 1e-12) / 127.0
+    quantized = np.rint(matrix / scales[:, None]).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
+ADD_BATCH_SIZE = 5000
+# AVX-512 loads are a full cache line; rows are padded so each one starts on one
+SIMD_ALIGNMENT = 64
+
+
+def _align_rows(matrix: np.ndarray) -> np.ndarray:
+    """Copy a 2-D matrix into a 64-byte aligned buffer, zero-padding rows to a multiple of 64 bytes.
+
+    Zero columns change neither dot products nor norms; queries are padded
+    to the same width before scoring.
+    """
+    per_line = SIMD_ALIGNMENT // matrix.dtype.itemsize
+    width = -(-matrix.shape[1] // per_line) * per_line
+    nbytes = matrix.shape[0] * width * matrix.dtype.itemsize
+    buffer = np.zeros(nbytes + SIMD_ALIGNMENT, dtype=np.uint8)
+    offset = -buffer.ctypes.data % SIMD_ALIGNMENT
+    aligned = buffer[offset:offset + nbytes].view(matrix.dtype).reshape(matrix.shape[0], width)
+    aligned[:, :matrix.shape[1]] = matrix
+    return aligned
+
+
+def _to_embedding_lists(embeddings) -> List[List[float]]:
+    """Convert embeddings to the nested lists Chroma 0.4 requires in one C-level pass.
+
+    Chroma 0.4.15 rejects ndarrays outright, so the conversion cannot be
+    skipped; stacking into one float32 array first avoids a Python-level
+    loop over rows and any accidental float64 payloads.
+    """
+    if isinstance(embeddings, np.ndarray) or (len(embeddings) and isinstance(embeddings[0], np.ndarray)):
+        return np.asarray(embeddings, dtype=np.float32).tolist()
+    return embeddings
+
+
 class VectorStore:
-    def __init__(self, persist_directory: str, collection_name: str = "uet_documents"):
+    def __init__(self, persist_directory: str, collection_name: str = "uet_documents", brute_force: bool = True):
         self.persist_directory = Path(persist_directory)
         self.persist_directory.mkdir(parents=True, exist_ok=True)
         self.collection_name = collection_name
+        # serve embedding queries from an in-memory matrix instead of Chroma's HNSW index
+        self.brute_force = brute_force
+        self._matrix = None
+        self._norm_matrix = None
+        self._flag_bitmaps = None
+        self._write_listeners = []
         
         logger.info(f"Initializing ChromaDB at {persist_directory}")
         
@@ -36,12 +96,14 @@ class VectorStore:
                 metadata={"hnsw:space": "cosine"}
             )
             
-            logger.info(f"ChromaDB collection '{collection_name}' ready with {self.collection.count()} documents")
+            # counted once here and tracked locally; collection.count() is a SQL COUNT(*)
+            self._count = self.collection.count()
+            logger.info(f"ChromaDB collection '{collection_name}' ready with {self._count} documents")
         except Exception as e:
             logger.error(f"Error initializing ChromaDB: {str(e)}")
             raise
 
-    def add_documents(self, documents: List[str], metadatas: Optional[List[Dict]] = None, ids: Optional[List[str]] = None, embeddings: Optional[List[List[float]]] = None):
+    def add_documents(self, documents: List[str], metadatas: Optional[List[Dict]] = None, ids: Optional[List[str]] = None, embeddings: Optional[np.ndarray] = None):
         try:
             if ids is None:
                 ids = [f"doc_{i}" for i in range(len(documents))]
@@ -50,25 +112,26 @@ class VectorStore:
                 metadatas = [{"source": "uet_document", "chunk_id": i} for i in range(len(documents))]
             
             logger.info(f"Adding {len(documents)} documents to collection")
-            # If embeddings are provided, ensure they're plain python lists (Chroma expects lists)
-            add_kwargs = {
-                "documents": documents,
-                "metadatas": metadatas,
-                "ids": ids
-            }
-            if embeddings is not None:
-                # convert numpy arrays or nested numpy arrays to lists
-                if isinstance(embeddings, np.ndarray):
-                    embeddings = embeddings.tolist()
-                else:
-                    # convert inner numpy arrays, if any
-                    embeddings = [e.tolist() if isinstance(e, np.ndarray) else e for e in embeddings]
+            # fixed-size slices amortize Chroma's per-call cost without building
+            # one giant request; ndarray embeddings are sliced as views
+            batch_size = min(ADD_BATCH_SIZE, getattr(self.client, "max_batch_size", ADD_BATCH_SIZE))
+            for start in range(0, len(documents), batch_size):
+                end = start + batch_size
+                add_kwargs = {
+                    "documents": documents[start:end],
+                    "metadatas": metadatas[start:end],
+                    "ids": ids[start:end]
+                }
+                if embeddings is not None:
+                    # Chroma expects plain python lists
+                    add_kwargs["embeddings"] = _to_embedding_lists(embeddings[start:end])
 
-                add_kwargs["embeddings"] = embeddings
-
-            self.collection.add(**add_kwargs)
+                self.collection.add(**add_kwargs)
+                self._count += len(add_kwargs["ids"])
+                logger.debug("Added documents %d-%d", start, min(end, len(documents)))
+            self._invalidate_matrix()
             
-            logger.info(f"Successfully added documents. Total count: {self.collection.count()}")
+            logger.info(f"Successfully added documents. Total count: {self._count}")
         except Exception as e:
             logger.error(f"Error adding documents to ChromaDB: {str(e)}")
             raise
@@ -77,13 +140,14 @@ class VectorStore:
         try:
             logger.info(f"Querying collection for top {n_results} results")
             
+            if query_embeddings is not None and self.brute_force and self._is_simple_filter(where):
+                return self._brute_force_query(query_embeddings, n_results, where)
+
             query_params = {"n_results": n_results}
 
             # If explicit query embeddings are provided, use them (ensures same embedder)
             if query_embeddings is not None:
-                if isinstance(query_embeddings, np.ndarray):
-                    query_embeddings = query_embeddings.tolist()
-                query_params["query_embeddings"] = [query_embeddings]
+                query_params["query_embeddings"] = _to_embedding_lists(np.reshape(query_embeddings, (1, -1)))
             else:
                 query_params["query_texts"] = [query_text]
             
@@ -99,6 +163,276 @@ class VectorStore:
             logger.error(f"Error querying ChromaDB: {str(e)}")
             raise
 
+    def _load_matrix(self) -> np.ndarray:
+        """Load every stored embedding once into an int8-quantized in-memory matrix.
+
+        Rows are L2-normalized and quantized with a per-row scale
+        (max |x| / 127); the float32 originals stay in Chroma for rebuilds.
+        The quantized matrix is persisted as .npy sidecar files next to the
+        Chroma database and memory-mapped on later starts, skipping the
+        collection.get() round-trip entirely.
+        """
+        if self._matrix is None and not self._load_sidecar():
+            data = self.collection.get(include=["embeddings", "metadatas", "documents"])
+            if data["ids"]:
+                matrix = np.array(data["embeddings"], dtype=np.float32, order="C").reshape(len(data["ids"]), -1)
+            else:
+                # reshape cannot infer the width of zero rows
+                matrix = np.empty((0, 0), dtype=np.float32)
+            if matrix.size:
+                matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+                quantized, self._scales = _quantize_int8(matrix)
+                self._matrix = _align_rows(quantized)
+            else:
+                self._matrix, self._scales = matrix.astype(np.int8), np.empty(0, dtype=np.float32)
+            self._row_norms = np.linalg.norm(self._matrix.astype(np.float32), axis=1)
+            self._ids = data["ids"]
+            self._documents = data["documents"]
+            self._metadatas = data["metadatas"]
+            logger.info(f"Loaded {len(self._ids)} int8-quantized embeddings into memory for brute-force search")
+            if self._ids:
+                self._save_sidecar()
+        if self._flag_bitmaps is None:
+            self._flag_bitmaps = self._build_flag_bitmaps()
+        return self._matrix
+
+    def _build_flag_bitmaps(self) -> Dict[str, np.ndarray]:
+        """Pack every boolean metadata field into a bitmap of ceil(N/8) bytes.
+
+        Equality filters on these fields (has_eligibility, has_faculty, ...)
+        then reduce to a bitwise AND instead of a pass over the metadata dicts.
+        """
+        flags = {}
+        for key in {key for meta in self._metadatas if meta for key in meta}:
+            values = [(meta or {}).get(key) for meta in self._metadatas]
+            if all(isinstance(value, bool) for value in values):
+                flags[key] = np.packbits(np.array(values, dtype=bool))
+        return flags
+
+    def _sidecar_paths(self) -> Dict[str, Path]:
+        prefix = f"{self.collection_name}."
+        return {
+            "matrix": self.persist_directory / f"{prefix}matrix.npy",
+            "scales": self.persist_directory / f"{prefix}scales.npy",
+            "norms": self.persist_directory / f"{prefix}norms.npy",
+            "ids": self.persist_directory / f"{prefix}ids.json"
+        }
+
+    def _load_sidecar(self) -> bool:
+        paths = self._sidecar_paths()
+        if not all(path.exists() for path in paths.values()):
+            return False
+        try:
+            with open(paths["ids"], "r", encoding="utf-8") as f:
+                rows = json.load(f)
+            # another process may have rewritten the collection, possibly with the same count
+            if len(rows["ids"]) != self._count or rows.get("fingerprint") != self._fingerprint():
+                logger.info("Brute-force sidecar is stale, rebuilding from Chroma")
+                return False
+            matrix = np.load(paths["matrix"], mmap_mode="r")
+            # .npy data starts 64-byte aligned in the page-aligned mapping;
+            # anything else (old or foreign files) is copied into alignment
+            if matrix.ctypes.data % SIMD_ALIGNMENT or (matrix.shape[1] * matrix.itemsize) % SIMD_ALIGNMENT:
+                matrix = _align_rows(np.asarray(matrix))
+            # top-k scans touch rows in no useful order, so skip read-ahead
+            if hasattr(mmap, "MADV_RANDOM") and getattr(matrix, "_mmap", None) is not None:
+                matrix._mmap.madvise(mmap.MADV_RANDOM)
+            self._scales = np.load(paths["scales"], mmap_mode="r")
+            self._row_norms = np.load(paths["norms"])
+            self._ids = rows["ids"]
+            self._documents = rows["documents"]
+            self._metadatas = rows["metadatas"]
+            self._matrix = matrix
+        except Exception as e:
+            logger.warning(f"Could not load brute-force sidecar: {str(e)}")
+            return False
+        logger.info(f"Memory-mapped {len(self._ids)} int8 embeddings from {paths['matrix']}")
+        return True
+
+    def _save_sidecar(self):
+        paths = self._sidecar_paths()
+        try:
+            # write to temporary files first so readers never see a torn sidecar;
+            # the pid keeps processes sharing the directory (pytest -n) apart
+            suffix = f".{os.getpid()}.tmp"
+            for name, array in (("matrix", self._matrix), ("scales", self._scales), ("norms", self._row_norms)):
+                tmp_path = paths[name].with_name(paths[name].name + suffix)
+                with open(tmp_path, "wb") as f:
+                    np.save(f, np.ascontiguousarray(array))
+                os.replace(tmp_path, paths[name])
+            tmp_path = paths["ids"].with_name(paths["ids"].name + suffix)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"fingerprint": self._fingerprint(), "ids": self._ids,
+                           "documents": self._documents, "metadatas": self._metadatas}, f)
+            os.replace(tmp_path, paths["ids"])
+        except Exception as e:
+            logger.warning(f"Could not write brute-force sidecar: {str(e)}")
+
+    def _fingerprint(self) -> str:
+        """Identify the collection's current contents: its ids plus the database file's last write."""
+        digest = hashlib.blake2b(digest_size=16)
+        for doc_id in sorted(self.collection.get(include=[])["ids"]):
+            digest.update(doc_id.encode("utf-8") + b"\0")
+        database = self.persist_directory / "chroma.sqlite3"
+        if database.exists():
+            stat = database.stat()
+            digest.update(f"{stat.st_mtime_ns}:{stat.st_size}".encode("utf-8"))
+        return digest.hexdigest()
+
+    def add_write_listener(self, callback):
+        """Call `callback()` after every write through this store."""
+        self._write_listeners.append(callback)
+
+    def _invalidate_matrix(self):
+        self._matrix = None
+        self._norm_matrix = None
+        self._flag_bitmaps = None
+        for path in self._sidecar_paths().values():
+            path.unlink(missing_ok=True)
+        for callback in self._write_listeners:
+            callback()
+
+    @staticmethod
+    def _is_simple_filter(where: Optional[Dict]) -> bool:
+        """True for no filter or plain {field: value} equality filters."""
+        if not where:
+            return True
+        return all(not key.startswith("$") and not isinstance(value, dict) for key, value in where.items())
+
+    def _brute_force_query(self, query_embedding, n_results: int, where: Optional[Dict] = None) -> Dict:
+        matrix = self._load_matrix()
+        empty = {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]}
+        if not len(self._ids):
+            return empty
+
+        query = self._pad_queries(np.asarray(query_embedding, dtype=np.float32).reshape(1, -1))
+        query_i8, _ = _quantize_int8(query / max(float(np.linalg.norm(query)), 1e-12))
+
+        candidates = np.arange(len(self._ids))
+        if where:
+            logger.info(f"Applying metadata filter: {where}")
+            candidates = self._filter_rows(where)
+            if not len(candidates):
+                return empty
+
+        # the Numba kernel scores only the candidate rows, while SimSIMD scores every
+        # row; SimSIMD keeps unfiltered scans, the kernel takes filtered ones
+        if topk_cosine_int8 is not None and (simsimd is None or len(candidates) < len(self._ids)):
+            rows, top_distances = topk_cosine_int8(matrix, self._row_norms, query_i8[0], candidates, n_results)
+        else:
+            if simsimd is not None:
+                distances = np.asarray(simsimd.cdist(query_i8, matrix, metric="cosine"))[0]
+            else:
+                dots = matrix @ query_i8[0].astype(np.int32)
+                query_norm = max(float(np.linalg.norm(query_i8.astype(np.float32))), 1e-12)
+                distances = 1.0 - dots / (np.maximum(self._row_norms, 1e-12) * query_norm)
+
+            k = min(n_results, len(candidates))
+            candidate_distances = distances[candidates]
+            if k < len(candidates):
+                top = np.argpartition(candidate_distances, k - 1)[:k]
+            else:
+                top = np.arange(len(candidates))
+            top = top[np.argsort(candidate_distances[top], kind="stable")]
+            rows = candidates[top]
+            top_distances = candidate_distances[top]
+
+        logger.info(f"Retrieved {len(rows)} results")
+        return {
+            "ids": [[self._ids[i] for i in rows]],
+            "documents": [[self._documents[i] for i in rows]],
+            "metadatas": [[self._metadatas[i] for i in rows]],
+            "distances": [top_distances.tolist()]
+        }
+
+    def _pad_queries(self, queries: np.ndarray) -> np.ndarray:
+        """Zero-pad query columns to the aligned matrix width."""
+        missing = self._matrix.shape[1] - queries.shape[1]
+        if missing > 0:
+            queries = np.pad(queries, ((0, 0), (0, missing)))
+        return queries
+
+    def _filter_rows(self, where: Dict) -> np.ndarray:
+        bitmaps = self._flag_bitmaps or {}
+        if all(key in bitmaps and isinstance(value, bool) for key, value in where.items()):
+            mask = np.full((len(self._ids) + 7) // 8, 0xFF, dtype=np.uint8)
+            for key, value in where.items():
+                mask &= bitmaps[key] if value else ~bitmaps[key]
+            return np.flatnonzero(np.unpackbits(mask, count=len(self._ids)))
+        return np.array([i for i, meta in enumerate(self._metadatas)
+                         if all(meta.get(key) == value for key, value in where.items())], dtype=np.intp)
+
+    def _float_matrix(self) -> np.ndarray:
+        """Unit-norm float32 view of the int8 matrix, built on first batch query."""
+        if self._norm_matrix is None:
+            matrix = _align_rows(self._load_matrix().astype(np.float32))
+            matrix /= np.maximum(self._row_norms, 1e-12)[:, None]
+            self._norm_matrix = matrix
+        return self._norm_matrix
+
+    def batch_query(self, query_embeddings: np.ndarray, n_results: int = 5, where: Dict = None) -> Dict:
+        """Top-k for many query embeddings at once with a single matrix multiply.
+
+        Returns Chroma-style results with one row per query.
+        """
+        try:
+            queries = np.asarray(query_embeddings, dtype=np.float32)
+            if queries.ndim == 1:
+                queries = queries[None, :]
+            logger.info(f"Batch querying collection for top {n_results} results of {len(queries)} queries")
+
+            if not self.brute_force or not self._is_simple_filter(where):
+                query_params = {"query_embeddings": _to_embedding_lists(queries), "n_results": n_results}
+                if where:
+                    query_params["where"] = where
+                return self.collection.query(**query_params)
+
+            self._load_matrix()
+            empty = {"ids": [[] for _ in queries], "documents": [[] for _ in queries],
+                     "metadatas": [[] for _ in queries], "distances": [[] for _ in queries]}
+            if not len(self._ids) or not len(queries):
+                return empty
+
+            # quantize like the single-query path, so both rank identically
+            # out of place: an aligned float32 input is the caller's own array,
+            # e.g. embeddings held in the retriever's query cache
+            queries = self._pad_queries(queries)
+            queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+            queries_i8, _ = _quantize_int8(queries)
+            queries = queries_i8.astype(np.float32)
+            queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+
+            candidates = np.arange(len(self._ids))
+            matrix = self._float_matrix()
+            if where:
+                logger.info(f"Applying metadata filter: {where}")
+                candidates = self._filter_rows(where)
+                if not len(candidates):
+                    return empty
+                matrix = matrix[candidates]
+
+            distances = 1.0 - queries @ matrix.T
+            k = min(n_results, len(candidates))
+            if k < len(candidates):
+                top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+            else:
+                top = np.broadcast_to(np.arange(len(candidates)), distances.shape)
+            top_distances = np.take_along_axis(distances, top, axis=1)
+            order = np.argsort(top_distances, axis=1, kind="stable")
+            top = np.take_along_axis(top, order, axis=1)
+            top_distances = np.take_along_axis(top_distances, order, axis=1)
+            rows = candidates[top]
+
+            return {
+                "ids": [[self._ids[i] for i in row] for row in rows],
+                "documents": [[self._documents[i] for i in row] for row in rows],
+                "metadatas": [[self._metadatas[i] for i in row] for row in rows],
+                "distances": top_distances.tolist()
+            }
+        except Exception as e:
+            logger.error(f"Error batch querying ChromaDB: {str(e)}")
+            raise
+
     def get_all_documents(self) -> Dict:
         try:
             results = self.collection.get()
@@ -111,6 +445,8 @@ class VectorStore:
     def delete_collection(self):
         try:
             self.client.delete_collection(name=self.collection_name)
+            self._count = 0
+            self._invalidate_matrix()
             logger.info(f"Deleted collection '{self.collection_name}'")
         except Exception as e:
             logger.error(f"Error deleting collection: {str(e)}")
@@ -123,13 +459,42 @@ class VectorStore:
                 name=self.collection_name,
                 metadata={"hnsw:space": "cosine"}
             )
+            self.refresh_count()
+            self._invalidate_matrix()
             logger.info(f"Reset collection '{self.collection_name}'")
         except Exception as e:
             logger.error(f"Error resetting collection: {str(e)}")
             raise
 
     def get_count(self) -> int:
-        return self.collection.count()
+        return self._count
+
+    def has_any(self) -> bool:
+        """Whether the collection holds at least one document, read from Chroma with a one-row peek."""
+        return bool(self.collection.peek(limit=1)["ids"])
+
+    def refresh_count(self) -> int:
+        """Re-sync the cached document count with Chroma, e.g. after external writes."""
+        self._count = self.collection.count()
+        return self._count
+
+    def warm_up(self):
+        """Fault in the search structures so the first real query does not pay for it.
+
+        Brute-force mode loads the int8 matrix (paging in the memory-mapped
+        sidecar) and its float32 view; otherwise one throwaway query pulls
+        the HNSW index into the page cache.
+        """
+        if not self._count:
+            return
+        try:
+            if self.brute_force:
+                self._float_matrix()
+            else:
+                dim = len(self.collection.peek(limit=1)["embeddings"][0])
+                self.collection.query(query_embeddings=[[0.0] * dim], n_results=1)
+        except Exception as e:
+            logger.warning(f"Vector store warm-up failed: {str(e)}")
 
 
 if __name__ == "__main__":
@@ -1,5 +1,6 @@
+import asyncio
 import logging
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Dict, List, Optional
 from backend.rag.retriever import Retriever
 from backend.rag.llm_client import LLMClient
 from backend.guardrail.scope_validator import ScopeValidator
@@ -31,98 +32,260 @@ class AnswerGenerator:
         temperature: float = 0.3
     ) -> Dict:
         try:
-            logger.info(f"Processing question: '{question}'")
-            
-            is_valid, guardrail_response = self.scope_validator.validate_and_respond(question)
-            
-            if not is_valid:
-                logger.info("Question rejected by guardrail")
-                return {
-                    'answer': guardrail_response,
-                    'citations': [],
-                    'sources': [],
-                    'metadata': {
-                        'guardrail_triggered': True,
-                        'question': question
-                    }
-                }
+            prepared = self._prepare(question, top_k)
+            if isinstance(prepared, dict):
+                return prepared
+            (context, question), retrieved_data = prepared
             
-            logger.info("Question passed guardrail validation")
-            
-            context, retrieved_data = self.retriever.retrieve_and_format(question, top_k=top_k)
-            
-            if not context:
-                logger.warning("No relevant context retrieved")
-                return {
-                    'answer': "I couldn't find relevant information in the UET documents to answer your question.",
-                    'citations': [],
-                    'sources': [],
-                    'metadata': {
-                        'guardrail_triggered': False,
-                        'retrieval_count': 0,
-                        'question': question
-                    }
-                }
+            logger.info("Generating answer with LLM...")
+            answer = self.llm_client.generate_from_parts(
+                context,
+                question,
+                max_tokens=max_tokens,
+                temperature=temperature
+            )
+            
+            return self._build_result(question, answer, retrieved_data, top_k)
+            
+        except Exception as e:
+            logger.error(f"Error generating answer: {str(e)}", exc_info=True)
+            return self._error_result(question, e)
+
+    async def agenerate_answer(
+        self,
+        question: str,
+        top_k: int = 5,
+        max_tokens: int = 512,
+        temperature: float = 0.3
+    ) -> Dict:
+        """Async generate_answer; never blocks the calling event loop."""
+        try:
+            rejected = self._check_guardrail(question)
+            if rejected is not None:
+                return rejected
             
-            prompt = self.llm_client.create_prompt(context, question)
+            context, retrieved_data = await self.retriever.aretrieve_and_format(question, top_k=top_k)
+            prepared = self._finish_prepare(question, context, retrieved_data)
+            if isinstance(prepared, dict):
+                return prepared
+            (context, question), retrieved_data = prepared
             
             logger.info("Generating answer with LLM...")
-            answer = self.llm_client.generate(
-                prompt=prompt,
+            answer = await self.llm_client.agenerate_from_parts(
+                context,
+                question,
                 max_tokens=max_tokens,
                 temperature=temperature
             )
             
-            citations = [doc['content'] for doc in retrieved_data]
-            
-            sources = []
-            for doc in retrieved_data:
-                meta = doc.get('metadata', {})
-                dist = doc.get('distance', 0.0)
-                sources.append({
-                    'chunk_id': meta.get('chunk_id', 0),
-                    'source': meta.get('source', 'unknown'),
-                    'relevance_score': float(1 - dist) if dist else 0.0
-                })
-            
-            result = {
-                'answer': answer,
-                'citations': citations,
-                'sources': sources,
-                'metadata': {
-                    'guardrail_triggered': False,
-                    'retrieval_count': len(citations),
-                    'question': question,
-                    'top_k': top_k
-                }
-            }
-            
-            logger.info(f"Answer generated successfully with {len(citations)} citations")
-            return result
+            return self._build_result(question, answer, retrieved_data, top_k)
             
         except Exception as e:
             logger.error(f"Error generating answer: {str(e)}", exc_info=True)
+            return self._error_result(question, e)
+
+    async def astream_answer(
+        self,
+        question: str,
+        top_k: int = 5,
+        max_tokens: int = 512,
+        temperature: float = 0.3
+    ) -> AsyncIterator[Dict]:
+        """Stream an answer as {'token': ...} events followed by one final result event.
+
+        The final event is the generate_answer result with 'done': True; the
+        answer it carries is the full concatenated text.
+        """
+        try:
+            rejected = self._check_guardrail(question)
+            if rejected is None:
+                context, retrieved_data = await self.retriever.aretrieve_and_format(question, top_k=top_k)
+                prepared = self._finish_prepare(question, context, retrieved_data)
+            else:
+                prepared = rejected
+            
+            if isinstance(prepared, dict):
+                yield {'token': prepared['answer']}
+                yield {**prepared, 'done': True}
+                return
+            (context, question), retrieved_data = prepared
+            
+            logger.info("Streaming answer from LLM...")
+            pieces = []
+            async for piece in self.llm_client.astream_from_parts(
+                context,
+                question,
+                max_tokens=max_tokens,
+                temperature=temperature
+            ):
+                pieces.append(piece)
+                yield {'token': piece}
+            
+            result = self._build_result(question, ''.join(pieces).strip(), retrieved_data, top_k)
+            yield {**result, 'done': True}
+            
+        except Exception as e:
+            logger.error(f"Error streaming answer: {str(e)}", exc_info=True)
+            yield {**self._error_result(question, e), 'done': True}
+
+    def generate_answer_batch(
+        self,
+        questions: List[str],
+        top_k: int = 5,
+        max_tokens: int = 512,
+        temperature: float = 0.3
+    ) -> List[Dict]:
+        """Answer many questions; must not be called from a running event loop."""
+        return asyncio.run(self.agenerate_answer_batch(
+            questions,
+            top_k=top_k,
+            max_tokens=max_tokens,
+            temperature=temperature
+        ))
+
+    async def agenerate_answer_batch(
+        self,
+        questions: List[str],
+        top_k: int = 5,
+        max_tokens: int = 512,
+        temperature: float = 0.3
+    ) -> List[Dict]:
+        logger.info(f"Processing batch of {len(questions)} questions")
+        
+        # 1) guardrail per question, then one batched retrieval for the accepted ones
+        results = [None] * len(questions)
+        accepted = []
+        for i, question in enumerate(questions):
+            rejected = self._check_guardrail(question)
+            if rejected is not None:
+                results[i] = rejected
+            else:
+                accepted.append(i)
+        
+        pending = []
+        if accepted:
+            try:
+                retrieved = await self.retriever.aretrieve_and_format_many(
+                    [questions[i] for i in accepted], top_k=top_k
+                )
+                for i, (context, retrieved_data) in zip(accepted, retrieved):
+                    prepared = self._finish_prepare(questions[i], context, retrieved_data)
+                    if isinstance(prepared, dict):
+                        results[i] = prepared
+                    else:
+                        pending.append((i, prepared))
+            except Exception as e:
+                logger.error(f"Error retrieving batch context: {str(e)}", exc_info=True)
+                for i in accepted:
+                    results[i] = self._error_result(questions[i], e)
+        
+        # 2) + 3) every question that needs an answer goes to the LLM together
+        if pending:
+            parts = [prompt_parts for _, (prompt_parts, _) in pending]
+            try:
+                logger.info(f"Generating {len(parts)} answers with LLM in one batch...")
+                answers = await self.llm_client.agenerate_batch_from_parts(
+                    parts,
+                    max_tokens=max_tokens,
+                    temperature=temperature
+                )
+                for (i, (_, retrieved_data)), answer in zip(pending, answers):
+                    results[i] = self._build_result(questions[i], answer, retrieved_data, top_k)
+            except Exception as e:
+                logger.error(f"Error generating batch answers: {str(e)}", exc_info=True)
+                for i, _ in pending:
+                    results[i] = self._error_result(questions[i], e)
+        
+        logger.info(f"Batch processing complete: {len(results)} answers generated")
+        return results
+
+    def _prepare(self, question: str, top_k: int):
+        """Run the guardrail and retrieval for a question.
+
+        Returns a finished result dict when no LLM call is needed, otherwise
+        a ((context, question), retrieved_data) tuple for the LLM client.
+        """
+        rejected = self._check_guardrail(question)
+        if rejected is not None:
+            return rejected
+        
+        context, retrieved_data = self.retriever.retrieve_and_format(question, top_k=top_k)
+        return self._finish_prepare(question, context, retrieved_data)
+
+    def _check_guardrail(self, question: str) -> Optional[Dict]:
+        logger.info(f"Processing question: '{question}'")
+        
+        is_valid, guardrail_response = self.scope_validator.validate_and_respond(question)
+        
+        if not is_valid:
+            logger.info("Question rejected by guardrail")
             return {
-                'answer': "An error occurred while processing your question. Please try again.",
+                'answer': guardrail_response,
                 'citations': [],
                 'sources': [],
                 'metadata': {
-                    'error': str(e),
+                    'guardrail_triggered': True,
                     'question': question
                 }
             }
+        
+        logger.info("Question passed guardrail validation")
+        return None
 
-    def generate_answer_batch(self, questions: List[str], **kwargs) -> List[Dict]:
-        logger.info(f"Processing batch of {len(questions)} questions")
+    def _finish_prepare(self, question: str, context: str, retrieved_data: List[Dict]):
+        if not context:
+            logger.warning("No relevant context retrieved")
+            return {
+                'answer': "I couldn't find relevant information in the UET documents to answer your question.",
+                'citations': [],
+                'sources': [],
+                'metadata': {
+                    'guardrail_triggered': False,
+                    'retrieval_count': 0,
+                    'question': question
+                }
+            }
         
-        results = []
-        for i, question in enumerate(questions, 1):
-            logger.info(f"Processing question {i}/{len(questions)}")
-            result = self.generate_answer(question, **kwargs)
-            results.append(result)
+        return (context, question), retrieved_data
+
+    def _build_result(self, question: str, answer: str, retrieved_data: List[Dict], top_k: int) -> Dict:
+        citations = [doc['content'] for doc in retrieved_data]
         
-        logger.info(f"Batch processing complete: {len(results)} answers generated")
-        return results
+        sources = []
+        for doc in retrieved_data:
+            meta = doc.get('metadata', {})
+            dist = doc.get('distance', 0.0)
+            sources.append({
+                'chunk_id': meta.get('chunk_id', 0),
+                'source': meta.get('source', 'unknown'),
+                'relevance_score': float(1 - dist) if dist else 0.0
+            })
+        
+        result = {
+            'answer': answer,
+            'citations': citations,
+            'sources': sources,
+            'metadata': {
+                'guardrail_triggered': False,
+                'retrieval_count': len(citations),
+                'question': question,
+                'top_k': top_k
+            }
+        }
+        
+        logger.info(f"Answer generated successfully with {len(citations)} citations")
+        return result
+
+    def _error_result(self, question: str, error: Exception) -> Dict:
+        return {
+            'answer': "An error occurred while processing your question. Please try again.",
+            'citations': [],
+            'sources': [],
+            'metadata': {
+                'error': str(error),
+                'question': question
+            }
+        }
 
 
 if __name__ == "__main__":
@@ -1,11 +1,36 @@
+import asyncio
+import importlib.util
 import logging
-from typing import Optional, Dict
+import threading
+import uuid
+from typing import AsyncIterator, Optional, Dict, List, Tuple
 import os
-from backend.config import LLM_MODEL
+from backend.config import LLM_MODEL, LLM_TORCH_COMPILE, LLM_DRAFT_MODEL
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# static pieces of the prompt template, tokenized once per client; the
+# question keeps its leading space so BPE sees the same word boundaries
+_PROMPT_HEAD = """You are a precise information assistant for UET (University of Engineering and Technology).
+
+CONTEXT:
+"""
+_PROMPT_QUESTION = "\n\nQUESTION:"
+_PROMPT_TAIL = """
+
+INSTRUCTIONS:
+- Answer using ONLY the exact information from the CONTEXT above
+- Quote specific details from the context when possible
+- If the context doesn't contain the answer, say "The provided context does not contain this information."
+- Do NOT make up names, numbers, or any other details
+- Be concise and accurate
+
+ANSWER:"""
+MAX_PROMPT_TOKENS = 1536
+# compiled graphs are captured per padded length, so prompts are padded up to one of these
+PROMPT_LENGTH_BUCKETS = (256, 512, 1024, MAX_PROMPT_TOKENS)
+
 
 class LLMClient:
     def __init__(self, model_name: str = None, use_vllm: bool = False):
@@ -13,6 +38,13 @@ class LLMClient:
         self.use_vllm = use_vllm
         self.model = None
         self.tokenizer = None
+        self.draft_model = None
+        self.compiled = False
+        self._engine_loop = None
+        self._vllm_tokenizer = None
+        # one shared HF model: concurrent generate() calls would stack activations
+        # on the GPU and compiled CUDA-graph replays are not thread-safe
+        self._generate_lock = threading.Lock()
         
         logger.info(f"Initializing LLM Client with model: {self.model_name}")
         
@@ -20,18 +52,24 @@ class LLMClient:
             self._initialize_vllm()
         else:
             self._initialize_transformers()
+        
+        self._prompt_ids = self._tokenize_template()
 
     def _initialize_vllm(self):
         try:
-            from vllm import LLM, SamplingParams
+            from vllm import AsyncEngineArgs, AsyncLLMEngine, SamplingParams
             
             logger.info("Initializing vLLM engine...")
-            self.model = LLM(
+            self.model = AsyncLLMEngine.from_engine_args(AsyncEngineArgs(
                 model=self.model_name,
                 trust_remote_code=True,
                 max_model_len=2048,
                 gpu_memory_utilization=0.8
-            )
+            ))
+            # the engine's background loop lives on its own thread, so sync
+            # callers and any number of request loops can submit work to it
+            self._engine_loop = asyncio.new_event_loop()
+            threading.Thread(target=self._engine_loop.run_forever, name="vllm-engine", daemon=True).start()
             self.sampling_params = SamplingParams(
                 temperature=0.7,
                 top_p=0.9,
@@ -57,7 +95,10 @@ class LLMClient:
             
             logger.info("Loading model with transformers...")
             
-            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+            # left padding keeps every prompt's last token at the end of the batch row
+            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name, padding_side="left")
+            if self.tokenizer.pad_token_id is None:
+                self.tokenizer.pad_token = self.tokenizer.eos_token
             
             device = "cuda" if torch.cuda.is_available() else "cpu"
             logger.info(f"Using device: {device}")
@@ -66,14 +107,16 @@ class LLMClient:
                 logger.info(f"GPU: {torch.cuda.get_device_name(0)}")
                 logger.info(f"GPU Memory: {torch.cuda.get_device_properties(0).total_memory / 1024**3:.2f} GB")
                 
-                self.model = AutoModelForCausalLM.from_pretrained(
-                    self.model_name,
-                    torch_dtype=torch.float16,
-                    device_map="auto",
-                    low_cpu_mem_usage=True,
-                    max_memory={0: "5GB"}
-                )
-                logger.info("Model loaded on GPU with float16 precision")
+                # bfloat16 needs Ampere or newer; FlashAttention-2 needs the flash_attn package
+                dtype = torch.bfloat16 if torch.cuda.get_device_capability(0)[0] >= 8 else torch.float16
+                attn_implementation = "flash_attention_2" if importlib.util.find_spec("flash_attn") else "sdpa"
+                try:
+                    self.model = self._load_causal_lm(AutoModelForCausalLM, dtype, attn_implementation)
+                except (ImportError, ValueError) as e:
+                    logger.warning(f"{attn_implementation} unavailable for this model ({str(e)}), using default attention")
+                    attn_implementation = None
+                    self.model = self._load_causal_lm(AutoModelForCausalLM, dtype, attn_implementation)
+                logger.info(f"Model loaded on GPU with {dtype} precision and {attn_implementation or 'default'} attention")
             else:
                 self.model = AutoModelForCausalLM.from_pretrained(
                     self.model_name,
@@ -83,12 +126,237 @@ class LLMClient:
                 self.model = self.model.to(device)
                 logger.info("Model loaded on CPU")
             
+            if LLM_DRAFT_MODEL:
+                self._load_draft_model(AutoModelForCausalLM, self.model.dtype, device)
+            
+            if LLM_TORCH_COMPILE:
+                self._compile_model()
+            
             logger.info("Model loaded successfully with transformers")
             
         except Exception as e:
             logger.error(f"Error initializing transformers: {str(e)}")
             raise
 
+    def _compile_model(self):
+        import torch
+        
+        try:
+            # compile forward only; generate() stays the regular python loop
+            self.model.forward = torch.compile(self.model.forward, mode="reduce-overhead", dynamic=True)
+            self.compiled = True
+            logger.info("Model forward compiled with torch.compile")
+        except Exception as e:
+            logger.warning(f"torch.compile unavailable, running eager: {str(e)}")
+
+    def _load_draft_model(self, model_cls, dtype, device: str):
+        try:
+            self.draft_model = model_cls.from_pretrained(
+                LLM_DRAFT_MODEL,
+                torch_dtype=dtype,
+                low_cpu_mem_usage=True,
+                **({"device_map": "auto"} if device == "cuda" else {})
+            )
+            if device != "cuda":
+                self.draft_model = self.draft_model.to(device)
+            logger.info(f"Speculative decoding enabled with draft model {LLM_DRAFT_MODEL}")
+        except Exception as e:
+            logger.warning(f"Could not load draft model {LLM_DRAFT_MODEL}, decoding without it: {str(e)}")
+            self.draft_model = None
+
+    def _load_causal_lm(self, model_cls, dtype, attn_implementation: Optional[str]):
+        kwargs = {"attn_implementation": attn_implementation} if attn_implementation else {}
+        return model_cls.from_pretrained(
+            self.model_name,
+            torch_dtype=dtype,
+            device_map="auto",
+            low_cpu_mem_usage=True,
+            max_memory={0: "5GB"},
+            **kwargs
+        )
+
+    def _get_tokenizer(self):
+        if self.use_vllm:
+            if self._vllm_tokenizer is None:
+                tokenizer = self.model.get_tokenizer()
+                # AsyncLLMEngine.get_tokenizer is a coroutine in recent vLLM releases
+                if asyncio.iscoroutine(tokenizer):
+                    tokenizer = self._run_on_engine_loop(tokenizer)
+                self._vllm_tokenizer = tokenizer
+            return self._vllm_tokenizer
+        return self.tokenizer
+
+    def _run_on_engine_loop(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._engine_loop).result()
+
+    def _encode(self, text: str) -> List[int]:
+        return self._get_tokenizer()(text, add_special_tokens=False)["input_ids"]
+
+    def _tokenize_template(self) -> Optional[Dict[str, List[int]]]:
+        """Token IDs of the static prompt pieces, or None if piecewise encoding is unsafe.
+
+        Some tokenizers (e.g. legacy sentencepiece) encode a string differently
+        on its own than inside a longer text; those keep the plain-prompt path.
+        """
+        try:
+            tokenizer = self._get_tokenizer()
+            prompt_ids = {
+                "special": tokenizer("")["input_ids"],
+                "head": self._encode(_PROMPT_HEAD),
+                "question": self._encode(_PROMPT_QUESTION),
+                "tail": self._encode(_PROMPT_TAIL)
+            }
+            self._prompt_ids = prompt_ids
+            sample = ("[Source 1] The Department of Computer Science offers BSc programs.", "What programs are offered?")
+            if self.encode_prompt(*sample) != tokenizer(self.create_prompt(*sample))["input_ids"]:
+                logger.info("Tokenizer is not piecewise-stable, prompts will be tokenized whole")
+                return None
+            return prompt_ids
+        except Exception as e:
+            logger.warning(f"Could not pre-tokenize prompt template: {str(e)}")
+            return None
+
+    def encode_prompt(self, context: str, question: str) -> List[int]:
+        """Token IDs of create_prompt(context, question), tokenizing only the dynamic parts."""
+        ids = self._prompt_ids
+        input_ids = (ids["special"] + ids["head"] + self._encode(context)
+                     + ids["question"] + self._encode(" " + question) + ids["tail"])
+        return input_ids[:MAX_PROMPT_TOKENS]
+
+    def generate_from_parts(self, context: str, question: str, max_tokens: int = 512, temperature: float = 0.3) -> str:
+        return self.generate_batch_from_parts([(context, question)], max_tokens, temperature)[0]
+
+    def generate_batch_from_parts(self, parts: List[Tuple[str, str]], max_tokens: int = 512, temperature: float = 0.3,
+                                  stop_event: Optional[threading.Event] = None) -> List[str]:
+        """Like generate_batch, for (context, question) pairs; skips re-tokenizing the template."""
+        if self._prompt_ids is None:
+            return self.generate_batch([self.create_prompt(context, question) for context, question in parts],
+                                       max_tokens, temperature, stop_event=stop_event)
+        try:
+            token_ids = [self.encode_prompt(context, question) for context, question in parts]
+            if self.use_vllm:
+                return self._generate_vllm_batch([{"prompt_token_ids": ids} for ids in token_ids], max_tokens, temperature)
+            return self._generate_transformers_batch(token_ids, max_tokens, temperature, stop_event=stop_event)
+        except Exception as e:
+            logger.error(f"Error during batch generation: {str(e)}")
+            raise
+
+    async def agenerate_batch_from_parts(self, parts: List[Tuple[str, str]], max_tokens: int = 512, temperature: float = 0.3) -> List[str]:
+        """Async generate_batch_from_parts; vLLM requests stream concurrently through the engine."""
+        if not self.use_vllm:
+            stop_event = threading.Event()
+            try:
+                return await asyncio.to_thread(self.generate_batch_from_parts, parts, max_tokens, temperature, stop_event)
+            except asyncio.CancelledError:
+                # the worker thread cannot be interrupted; make generate() end at its next step
+                stop_event.set()
+                raise
+        if self._prompt_ids is None:
+            prompts = [self.create_prompt(context, question) for context, question in parts]
+        else:
+            prompts = [{"prompt_token_ids": self.encode_prompt(context, question)} for context, question in parts]
+        try:
+            future = asyncio.run_coroutine_threadsafe(
+                self._agenerate_vllm_many(prompts, max_tokens, temperature), self._engine_loop
+            )
+            return await asyncio.wrap_future(future)
+        except Exception as e:
+            logger.error(f"Error during batch generation: {str(e)}")
+            raise
+
+    async def agenerate_from_parts(self, context: str, question: str, max_tokens: int = 512, temperature: float = 0.3) -> str:
+        return (await self.agenerate_batch_from_parts([(context, question)], max_tokens, temperature))[0]
+
+    async def astream_from_parts(self, context: str, question: str, max_tokens: int = 512, temperature: float = 0.3) -> AsyncIterator[str]:
+        """Yield the answer for (context, question) as text pieces while it is generated."""
+        if self._prompt_ids is None:
+            prompt = self.create_prompt(context, question)
+        else:
+            prompt = {"prompt_token_ids": self.encode_prompt(context, question)}
+        
+        # both backends produce pieces on another thread; hand them over through a queue
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        done = object()
+        stop_event = threading.Event()
+        
+        def put(item):
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        
+        if self.use_vllm:
+            # cancelling the wrapped future aborts the engine request too
+            future = asyncio.wrap_future(asyncio.run_coroutine_threadsafe(
+                self._astream_vllm(prompt, max_tokens, temperature, put, done), self._engine_loop
+            ))
+        else:
+            future = loop.run_in_executor(None, self._stream_transformers, prompt, max_tokens, temperature, put, done, stop_event)
+        
+        try:
+            while True:
+                piece = await queue.get()
+                if piece is done:
+                    break
+                yield piece
+            await future
+        except Exception as e:
+            logger.error(f"Error during streaming generation: {str(e)}")
+            raise
+        finally:
+            # a disconnected client or a timeout lands here; stop the transformers worker too
+            stop_event.set()
+            future.cancel()
+
+    async def _astream_vllm(self, prompt, max_tokens: int, temperature: float, put, done):
+        from vllm import SamplingParams
+        
+        sampling_params = SamplingParams(
+            temperature=temperature,
+            top_p=0.9,
+            max_tokens=max_tokens,
+            stop=["</s>", "<end_of_turn>"]
+        )
+        
+        sent = 0
+        try:
+            # vLLM reports the cumulative text; forward only what is new
+            async for output in self.model.generate(prompt, sampling_params, request_id=uuid.uuid4().hex):
+                text = output.outputs[0].text
+                if len(text) > sent:
+                    put(text[sent:])
+                    sent = len(text)
+        finally:
+            put(done)
+
+    def _stream_transformers(self, prompt, max_tokens: int, temperature: float, put, done, stop_event: threading.Event):
+        from transformers import TextIteratorStreamer
+        
+        try:
+            if isinstance(prompt, dict):
+                token_ids = prompt["prompt_token_ids"]
+            else:
+                token_ids = self.tokenizer(prompt, truncation=True, max_length=MAX_PROMPT_TOKENS)["input_ids"]
+            streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+            errors = []
+            
+            def run():
+                try:
+                    self._generate_transformers_batch([token_ids], max_tokens, temperature,
+                                                      streamer=streamer, stop_event=stop_event)
+                except Exception as e:
+                    errors.append(e)
+                    streamer.end()
+            
+            worker = threading.Thread(target=run, daemon=True)
+            worker.start()
+            for piece in streamer:
+                if piece:
+                    put(piece)
+            worker.join()
+            if errors:
+                raise errors[0]
+        finally:
+            put(done)
+
     def generate(self, prompt: str, max_tokens: int = 512, temperature: float = 0.3) -> str:
         try:
             if self.use_vllm:
@@ -99,7 +367,28 @@ class LLMClient:
             logger.error(f"Error during generation: {str(e)}")
             raise
 
+    def generate_batch(self, prompts: List[str], max_tokens: int = 512, temperature: float = 0.3,
+                       stop_event: Optional[threading.Event] = None) -> List[str]:
+        try:
+            if self.use_vllm:
+                return self._generate_vllm_batch(prompts, max_tokens, temperature)
+            token_ids = self.tokenizer(prompts, truncation=True, max_length=MAX_PROMPT_TOKENS)["input_ids"]
+            return self._generate_transformers_batch(token_ids, max_tokens, temperature, stop_event=stop_event)
+        except Exception as e:
+            logger.error(f"Error during batch generation: {str(e)}")
+            raise
+
+    def _generate_vllm_batch(self, prompts: List, max_tokens: int, temperature: float) -> List[str]:
+        generated_texts = self._run_on_engine_loop(self._agenerate_vllm_many(prompts, max_tokens, temperature))
+        logger.info(f"Generated {len(generated_texts)} answers with vLLM")
+        return generated_texts
+
     def _generate_vllm(self, prompt: str, max_tokens: int, temperature: float) -> str:
+        generated_text = self._run_on_engine_loop(self._agenerate_vllm_many([prompt], max_tokens, temperature))[0]
+        logger.info(f"Generated {len(generated_text)} characters with vLLM")
+        return generated_text
+
+    async def _agenerate_vllm_many(self, prompts: List, max_tokens: int, temperature: float) -> List[str]:
         from vllm import SamplingParams
         
         sampling_params = SamplingParams(
@@ -109,54 +398,70 @@ class LLMClient:
             stop=["</s>", "<end_of_turn>"]
         )
         
-        outputs = self.model.generate([prompt], sampling_params)
-        generated_text = outputs[0].outputs[0].text
-        
-        logger.info(f"Generated {len(generated_text)} characters with vLLM")
-        return generated_text.strip()
+        # every prompt is its own engine request, so continuous batching
+        # schedules them alongside whatever else is in flight
+        return await asyncio.gather(*(self._agenerate_vllm(prompt, sampling_params) for prompt in prompts))
+
+    async def _agenerate_vllm(self, prompt, sampling_params) -> str:
+        final_output = None
+        async for output in self.model.generate(prompt, sampling_params, request_id=uuid.uuid4().hex):
+            final_output = output
+        return final_output.outputs[0].text.strip()
 
     def _generate_transformers(self, prompt: str, max_tokens: int, temperature: float) -> str:
+        inputs = self.tokenizer(prompt, truncation=True, max_length=MAX_PROMPT_TOKENS)
+        return self._generate_transformers_batch([inputs["input_ids"]], max_tokens, temperature)[0]
+
+    def _generate_transformers_batch(self, token_ids: List[List[int]], max_tokens: int, temperature: float, streamer=None,
+                                     stop_event: Optional[threading.Event] = None) -> List[str]:
+        """Generate for many tokenized prompts in a single left-padded generate() call.
+
+        Calls are serialized on the shared model; setting stop_event ends
+        generation after the current decoding step.
+        """
         import torch
+        from transformers import StoppingCriteriaList
         
-        inputs = self.tokenizer(prompt, return_tensors="pt", truncation=True, max_length=1536)
+        longest = max(len(ids) for ids in token_ids)
+        if self.compiled:
+            bucket = next((size for size in PROMPT_LENGTH_BUCKETS if size >= longest), longest)
+            inputs = self.tokenizer.pad({"input_ids": token_ids}, padding="max_length", max_length=bucket, return_tensors="pt")
+        else:
+            inputs = self.tokenizer.pad({"input_ids": token_ids}, padding=True, return_tensors="pt")
         inputs = {k: v.to(self.model.device) for k, v in inputs.items()}
         
         input_length = inputs['input_ids'].shape[1]
         
-        with torch.no_grad():
+        # transformers' assisted generation only supports one sequence at a time
+        assisted = {"assistant_model": self.draft_model} if self.draft_model is not None and len(token_ids) == 1 else {}
+        
+        stopping = {}
+        if stop_event is not None:
+            stopping["stopping_criteria"] = StoppingCriteriaList([lambda input_ids, scores, **kwargs: stop_event.is_set()])
+        
+        with self._generate_lock, torch.inference_mode():
             outputs = self.model.generate(
                 **inputs,
+                **assisted,
+                **stopping,
+                streamer=streamer,
                 max_new_tokens=max_tokens,
                 temperature=temperature,
                 top_p=0.9,
                 do_sample=True,
-                pad_token_id=self.tokenizer.eos_token_id,
+                use_cache=True,
+                pad_token_id=self.tokenizer.pad_token_id,
                 eos_token_id=self.tokenizer.eos_token_id
             )
         
-        generated_tokens = outputs[0][input_length:]
-        generated_text = self.tokenizer.decode(generated_tokens, skip_special_tokens=True).strip()
+        generated_texts = self.tokenizer.batch_decode(outputs[:, input_length:], skip_special_tokens=True)
+        generated_texts = [text.strip() for text in generated_texts]
         
-        logger.info(f"Generated {len(generated_text)} characters with transformers")
-        return generated_text
+        logger.info(f"Generated {len(generated_texts)} answers with transformers")
+        return generated_texts
 
     def create_prompt(self, context: str, question: str) -> str:
-        prompt = f"""You are a precise information assistant for UET (University of Engineering and Technology).
-
-CONTEXT:
-{context}
-
-QUESTION: {question}
-
-INSTRUCTIONS:
-- Answer using ONLY the exact information from the CONTEXT above
-- Quote specific details from the context when possible
-- If the context doesn't contain the answer, say "The provided context does not contain this information."
-- Do NOT make up names, numbers, or any other details
-- Be concise and accurate
-
-ANSWER:"""
-        return prompt
+        return f"{_PROMPT_HEAD}{context}{_PROMPT_QUESTION} {question}{_PROMPT_TAIL}"
 
 
 if __name__ == "__main__":
@@ -0,0 +1,69 @@
+import functools
+from typing import Optional, Tuple
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# query term -> intent tags; terms match as plain substrings of the lowercased query
+_QUERY_TERMS = {
+    "admission": ("expand_eligibility", "filter_eligibility"),
+    "requirement": ("expand_eligibility", "filter_eligibility"),
+    "eligibility": ("expand_eligibility", "filter_eligibility"),
+    "criteria": ("filter_eligibility",),
+    "faculty": ("expand_faculty", "filter_faculty"),
+    "professor": ("expand_faculty", "filter_faculty"),
+    "staff": ("expand_faculty", "filter_faculty"),
+    "dean": ("filter_faculty",),
+    "chairman": ("filter_faculty",),
+    "program": ("expand_programs", "filter_programs"),
+    "degree": ("expand_programs", "filter_programs"),
+    "offered": ("filter_programs",),
+}
+_EXPANSIONS = (
+    ("expand_eligibility", "eligibility criteria admission requirements"),
+    ("expand_faculty", "faculty members professors"),
+    ("expand_programs", "offered programs degrees"),
+)
+# queries this long already carry enough signal; expansion only adds noise
+EXPANSION_MAX_WORDS = 12
+# first matching tag wins
+_FILTERS = (
+    ("filter_eligibility", (("has_eligibility", True),)),
+    ("filter_faculty", (("has_faculty", True),)),
+    ("filter_programs", (("has_programs", True),)),
+)
+
+
+def _build_query_automaton():
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for term, tags in _QUERY_TERMS.items():
+        automaton.add_word(term, tags)
+    automaton.make_automaton()
+    return automaton
+
+
+_QUERY_AUTOMATON = _build_query_automaton()
+
+
+@functools.lru_cache(maxsize=4096)
+def classify_query(query_lower: str) -> Tuple[str, Optional[tuple]]:
+    """Scan the query once and return (expansion text, metadata filter items).
+
+    Long queries are never expanded, and expansion terms the query already
+    contains are not repeated.
+    """
+    if _QUERY_AUTOMATON is not None:
+        tags = {tag for _, term_tags in _QUERY_AUTOMATON.iter(query_lower) for tag in term_tags}
+    else:
+        tags = {tag for term, term_tags in _QUERY_TERMS.items() if term in query_lower for tag in term_tags}
+    if len(query_lower.split()) >= EXPANSION_MAX_WORDS:
+        expansion = ''
+    else:
+        expansion = ' '.join(term for tag, text in _EXPANSIONS if tag in tags
+                             for term in text.split() if term not in query_lower)
+    where = next((items for tag, items in _FILTERS if tag in tags), None)
+    return expansion, where
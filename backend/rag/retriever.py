@@ -1,9 +1,17 @@
+import asyncio
 import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict
+import numpy as np
 from backend.preprocessing.vector_store import VectorStore
 from backend.preprocessing.embedder import TextEmbedder
-from backend.config import EMBEDDING_MODEL
+from backend.rag.semantic_cache import SemanticCache
+from backend.rag.query_classifier import classify_query
+from backend.config import EMBEDDING_MODEL, EMBEDDING_USE_VLLM
 from backend.config import CHROMA_DB_DIR, TOP_K_RETRIEVAL, APPLY_METADATA_FILTER
+from backend.config import SEMANTIC_CACHE_SIZE, SEMANTIC_CACHE_THRESHOLD, QUERY_EMBEDDING_CACHE_SIZE
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -24,7 +32,20 @@ class Retriever:
                 collection_name="uet_documents"
             )
             # embedder used to compute query embeddings with same model as index
-            self.embedder = TextEmbedder(model_name=EMBEDDING_MODEL)
+            self.embedder = TextEmbedder(model_name=EMBEDDING_MODEL, use_vllm=EMBEDDING_USE_VLLM)
+            self.cache = SemanticCache(
+                capacity=SEMANTIC_CACHE_SIZE,
+                threshold=SEMANTIC_CACHE_THRESHOLD
+            ) if SEMANTIC_CACHE_SIZE > 0 else None
+            # exact-text fast path in front of the embedder: a repeated query skips
+            # the forward pass and goes straight to the semantic cache
+            self._query_embeddings = OrderedDict()
+            self._query_embeddings_lock = threading.Lock()
+            # cached results would outlive documents added or removed by a re-index
+            self.vector_store.add_write_listener(self.clear_caches)
+            # Chroma's client is not safe to share across threads, so async
+            # retrieval funnels every vector store call through one thread
+            self._store_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vector-store")
             logger.info(f"Retriever ready with {self.vector_store.get_count()} documents")
         except Exception as e:
             logger.error(f"Error initializing Retriever: {str(e)}")
@@ -34,29 +55,29 @@ class Retriever:
         k = top_k or self.top_k
         
         try:
-            expanded_query = self._expand_query(query)
-            metadata_filter = self._get_metadata_filter(query) if APPLY_METADATA_FILTER else None
-
-            # compute query embeddings using the same embedder used for indexing
-            try:
-                query_embedding = self.embedder.embed_text(expanded_query)
-            except Exception:
-                query_embedding = None
+            expanded_query, metadata_filter = self._prepare_query(query, k)
+            query_embedding = self._embed_query(expanded_query)
+            documents = self._cached_search(expanded_query, k, metadata_filter, query_embedding)
             
-            logger.info(f"Retrieving top {k} documents for query: '{query}'")
-            if expanded_query != query:
-                logger.info(f"Expanded query: '{expanded_query}'")
-            
-            results = self.vector_store.query(query_text=expanded_query, n_results=k, where=metadata_filter, query_embeddings=query_embedding)
+            logger.info(f"Retrieved {len(documents)} documents")
+            return documents
             
-            documents = []
-            for i, doc in enumerate(results['documents'][0]):
-                documents.append({
-                    'content': doc,
-                    'metadata': results['metadatas'][0][i] if results['metadatas'] else {},
-                    'id': results['ids'][0][i] if results['ids'] else f"doc_{i}",
-                    'distance': results['distances'][0][i] if results['distances'] else 0.0
-                })
+        except Exception as e:
+            logger.error(f"Error during retrieval: {str(e)}")
+            raise
+
+    async def aretrieve(self, query: str, top_k: int = None) -> List[Dict]:
+        """Async retrieve: embeds in a worker thread, searches on the vector store thread."""
+        k = top_k or self.top_k
+        
+        try:
+            expanded_query, metadata_filter = self._prepare_query(query, k)
+            query_embedding = await asyncio.to_thread(self._embed_query, expanded_query)
+            loop = asyncio.get_running_loop()
+            documents = await loop.run_in_executor(
+                self._store_executor,
+                self._cached_search, expanded_query, k, metadata_filter, query_embedding
+            )
             
             logger.info(f"Retrieved {len(documents)} documents")
             return documents
@@ -64,35 +85,165 @@ class Retriever:
         except Exception as e:
             logger.error(f"Error during retrieval: {str(e)}")
             raise
-    
-    def _expand_query(self, query: str) -> str:
+
+    def retrieve_many(self, queries: List[str], top_k: int = None) -> List[List[Dict]]:
+        """Retrieve for several queries, embedding all of them in one forward pass."""
+        k = top_k or self.top_k
+        
+        try:
+            prepared = [self._prepare_query(query, k) for query in queries]
+            embeddings = self._embed_queries([expanded_query for expanded_query, _ in prepared])
+            return self._search_many(prepared, k, embeddings)
+            
+        except Exception as e:
+            logger.error(f"Error during batch retrieval: {str(e)}")
+            raise
+
+    async def aretrieve_many(self, queries: List[str], top_k: int = None) -> List[List[Dict]]:
+        k = top_k or self.top_k
+        
+        try:
+            prepared = [self._prepare_query(query, k) for query in queries]
+            embeddings = await asyncio.to_thread(
+                self._embed_queries, [expanded_query for expanded_query, _ in prepared]
+            )
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._store_executor, self._search_many, prepared, k, embeddings)
+            
+        except Exception as e:
+            logger.error(f"Error during batch retrieval: {str(e)}")
+            raise
+
+    def _embed_queries(self, expanded_queries: List[str]) -> list:
+        if not expanded_queries:
+            return []
+        embeddings = [self._cached_embedding(query) for query in expanded_queries]
+        misses = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if not misses:
+            return embeddings
+        try:
+            computed = self.embedder.embed_batch([expanded_queries[i] for i in misses], show_progress=False)
+        except Exception:
+            return embeddings
+        for i, embedding in zip(misses, computed):
+            embeddings[i] = embedding
+            self._store_embedding(expanded_queries[i], embedding)
+        return embeddings
+
+    def _search_many(self, prepared: list, k: int, embeddings: list) -> List[List[Dict]]:
+        def compute_many(indices: List[int]) -> List[List[Dict]]:
+            found = {}
+            # one matrix multiply per distinct metadata filter
+            groups = {}
+            for i in indices:
+                expanded_query, metadata_filter = prepared[i]
+                if embeddings[i] is None:
+                    found[i] = self._search(expanded_query, k, metadata_filter, None)
+                else:
+                    key = repr(sorted(metadata_filter.items())) if metadata_filter else None
+                    groups.setdefault(key, []).append(i)
+            for group in groups.values():
+                metadata_filter = prepared[group[0]][1]
+                results = self.vector_store.batch_query(
+                    np.stack([embeddings[i] for i in group]), n_results=k, where=metadata_filter
+                )
+                for row, i in enumerate(group):
+                    found[i] = self._to_documents(results, row)
+            return [found[i] for i in indices]
+        
+        if self.cache is not None and all(embedding is not None for embedding in embeddings):
+            results = self.cache.get_or_compute_many(
+                embeddings, k, compute_many, [metadata_filter for _, metadata_filter in prepared]
+            )
+        else:
+            results = compute_many(list(range(len(prepared))))
+        logger.info(f"Retrieved documents for {len(results)} queries")
+        return results
+
+    def _prepare_query(self, query: str, k: int):
+        expanded_query = self.expand_query(query)
+        metadata_filter = self._get_metadata_filter(query) if APPLY_METADATA_FILTER else None
+        
+        logger.info(f"Retrieving top {k} documents for query: '{query}'")
+        if expanded_query != query:
+            logger.info(f"Expanded query: '{expanded_query}'")
+        return expanded_query, metadata_filter
+
+    def _embed_query(self, expanded_query: str):
+        embedding = self._cached_embedding(expanded_query)
+        if embedding is not None:
+            return embedding
+        # compute query embeddings using the same embedder used for indexing
+        try:
+            embedding = self.embedder.embed_text(expanded_query)
+        except Exception:
+            return None
+        self._store_embedding(expanded_query, embedding)
+        return embedding
+
+    def _cached_embedding(self, expanded_query: str):
+        with self._query_embeddings_lock:
+            embedding = self._query_embeddings.get(expanded_query)
+            if embedding is not None:
+                self._query_embeddings.move_to_end(expanded_query)
+            return embedding
+
+    def _store_embedding(self, expanded_query: str, embedding):
+        if QUERY_EMBEDDING_CACHE_SIZE <= 0:
+            return
+        with self._query_embeddings_lock:
+            self._query_embeddings[expanded_query] = embedding
+            if len(self._query_embeddings) > QUERY_EMBEDDING_CACHE_SIZE:
+                self._query_embeddings.popitem(last=False)
+
+    def prime_embeddings(self, expanded_queries: List[str], embeddings):
+        """Seed the exact-text cache with embeddings of `expand_query` outputs computed elsewhere."""
+        for expanded_query, embedding in zip(expanded_queries, embeddings):
+            self._store_embedding(expanded_query, np.asarray(embedding, dtype=np.float32))
+
+    def clear_caches(self):
+        """Drop cached query embeddings and retrieval results."""
+        if self.cache is not None:
+            self.cache.clear()
+        with self._query_embeddings_lock:
+            self._query_embeddings.clear()
+
+    def _cached_search(self, query_text: str, k: int, where: Dict, query_embedding) -> List[Dict]:
+        def search():
+            return self._search(query_text, k, where, query_embedding)
+        
+        if self.cache is not None and query_embedding is not None:
+            return self.cache.get_or_compute(query_embedding, k, search, where=where)
+        return search()
+
+    def _search(self, query_text: str, k: int, where: Dict, query_embedding) -> List[Dict]:
+        results = self.vector_store.query(query_text=query_text, n_results=k, where=where, query_embeddings=query_embedding)
+        return self._to_documents(results, 0)
+
+    @staticmethod
+    def _to_documents(results: Dict, row: int) -> List[Dict]:
+        documents = []
+        for i, doc in enumerate(results['documents'][row]):
+            documents.append({
+                'content': doc,
+                'metadata': results['metadatas'][row][i] if results['metadatas'] else {},
+                'id': results['ids'][row][i] if results['ids'] else f"doc_{i}",
+                'distance': results['distances'][row][i] if results['distances'] else 0.0
+            })
+        return documents
+
+    def expand_query(self, query: str) -> str:
         """Expand query with related terms for better retrieval"""
-        query_lower = query.lower()
-        
-        expansions = []
-        if "admission" in query_lower or "requirement" in query_lower or "eligibility" in query_lower:
-            expansions.append("eligibility criteria admission requirements")
-        if "faculty" in query_lower or "professor" in query_lower or "staff" in query_lower:
-            expansions.append("faculty members professors")
-        if "program" in query_lower or "degree" in query_lower:
-            expansions.append("offered programs degrees")
-        
-        if expansions:
-            return f"{query} {' '.join(expansions)}"
+        expansion, _ = classify_query(query.lower())
+        
+        if expansion:
+            return f"{query} {expansion}"
         return query
     
     def _get_metadata_filter(self, query: str) -> Dict:
         """Create metadata filter based on query intent"""
-        query_lower = query.lower()
-        
-        if any(term in query_lower for term in ["admission", "requirement", "eligibility", "criteria"]):
-            return {"has_eligibility": True}
-        elif any(term in query_lower for term in ["faculty", "professor", "staff", "dean", "chairman"]):
-            return {"has_faculty": True}
-        elif any(term in query_lower for term in ["program", "degree", "offered"]):
-            return {"has_programs": True}
-        
-        return None
+        _, where = classify_query(query.lower())
+        return dict(where) if where else None
 
     def format_context(self, documents: List[Dict]) -> str:
         if not documents:
@@ -114,6 +265,17 @@ class Retriever:
         context = self.format_context(documents)
         return context, documents
 
+    def retrieve_and_format_many(self, queries: List[str], top_k: int = None) -> List[tuple[str, List[Dict]]]:
+        return [(self.format_context(documents), documents) for documents in self.retrieve_many(queries, top_k)]
+
+    async def aretrieve_and_format_many(self, queries: List[str], top_k: int = None) -> List[tuple[str, List[Dict]]]:
+        return [(self.format_context(documents), documents) for documents in await self.aretrieve_many(queries, top_k)]
+
+    async def aretrieve_and_format(self, query: str, top_k: int = None) -> tuple[str, List[Dict]]:
+        documents = await self.aretrieve(query, top_k)
+        context = self.format_context(documents)
+        return context, documents
+
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,154 @@
+import logging
+import threading
+from typing import Callable, Dict, List, Optional
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class SemanticCache:
+    """Similarity-aware LRU cache of retrieval results.
+
+    Entries are keyed by the normalized query embedding. A lookup scores the
+    query against every cached key with one matrix-vector product and reuses
+    the best entry when its cosine similarity clears the threshold of the
+    query's region (a random-hyperplane bucket of the embedding space).
+
+    Region thresholds are learned online: hits just above the threshold are
+    verified against a real retrieval and the threshold is raised when the
+    cached documents turn out to be different; misses just below it whose
+    real documents equal the cached ones lower it.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 1024,
+        threshold: float = 0.95,
+        region_bits: int = 4,
+        margin: float = 0.02,
+        learning_rate: float = 0.005,
+        min_threshold: float = 0.85,
+        max_threshold: float = 0.995,
+        seed: int = 0
+    ):
+        self.capacity = capacity
+        self.region_bits = region_bits
+        self.margin = margin
+        self.learning_rate = learning_rate
+        self.min_threshold = min_threshold
+        self.max_threshold = max_threshold
+        self.thresholds = np.full(2 ** region_bits, threshold, dtype=np.float32)
+        self.seed = seed
+
+        self._keys = None
+        self._last_used = np.zeros(capacity, dtype=np.int64)
+        self._values = [None] * capacity
+        self._size = 0
+        self._clock = 0
+        self._planes = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        logger.info(f"Initialized SemanticCache with capacity={capacity}, threshold={threshold}")
+
+    def get_or_compute(
+        self,
+        embedding: np.ndarray,
+        top_k: int,
+        compute: Callable[[], List[Dict]],
+        where: Optional[Dict] = None
+    ) -> List[Dict]:
+        """Return cached documents for a similar query, or compute and cache them."""
+        return self.get_or_compute_many([embedding], top_k, lambda misses: [compute()], [where])[0]
+
+    def get_or_compute_many(
+        self,
+        embeddings: List[np.ndarray],
+        top_k: int,
+        compute_many: Callable[[List[int]], List[List[Dict]]],
+        wheres: Optional[List[Optional[Dict]]] = None
+    ) -> List[List[Dict]]:
+        """Batch variant: compute_many receives the indices of all misses at once."""
+        wheres = wheres or [None] * len(embeddings)
+        results = [None] * len(embeddings)
+        misses = []
+
+        with self._lock:
+            for i, (embedding, where) in enumerate(zip(embeddings, wheres)):
+                query = np.asarray(embedding, dtype=np.float32).ravel()
+                query = query / max(float(np.linalg.norm(query)), 1e-12)
+                filter_key = repr(sorted(where.items())) if where else None
+                region = self._region(query)
+                threshold = float(self.thresholds[region])
+                slot, similarity = self._best_match(query, top_k, filter_key)
+                if slot is not None and similarity >= threshold + self.margin:
+                    self._clock += 1
+                    self._last_used[slot] = self._clock
+                    self.hits += 1
+                    results[i] = self._values[slot]["documents"][:top_k]
+                    continue
+                cached = self._values[slot]["documents"][:top_k] if slot is not None else None
+                misses.append((i, query, filter_key, region, threshold, cached, similarity))
+
+        if not misses:
+            return results
+
+        computed = compute_many([miss[0] for miss in misses])
+
+        with self._lock:
+            for (i, query, filter_key, region, threshold, cached, similarity), documents in zip(misses, computed):
+                if cached is not None and similarity >= threshold - self.margin:
+                    same = [doc.get("id") for doc in cached] == [doc.get("id") for doc in documents]
+                    if similarity >= threshold and not same:
+                        # borderline hit would have been wrong: be stricter here
+                        self._adjust(region, +self.learning_rate)
+                    elif similarity < threshold and same:
+                        # near miss would have been right: be more lenient here
+                        self._adjust(region, -self.learning_rate)
+                self.misses += 1
+                self._insert(query, top_k, filter_key, documents)
+                results[i] = documents
+
+        return results
+
+    def clear(self):
+        with self._lock:
+            self._values = [None] * self.capacity
+            self._last_used[:] = 0
+            self._size = 0
+
+    def _region(self, query: np.ndarray) -> int:
+        if self._planes is None:
+            rng = np.random.default_rng(self.seed)
+            self._planes = rng.standard_normal((self.region_bits, query.shape[0])).astype(np.float32)
+        bits = (self._planes @ query) > 0
+        return int(bits @ (1 << np.arange(self.region_bits)))
+
+    def _best_match(self, query: np.ndarray, top_k: int, filter_key):
+        if not self._size:
+            return None, -1.0
+        similarities = self._keys[:self._size] @ query
+        for slot in np.argsort(-similarities):
+            value = self._values[slot]
+            if value["top_k"] >= top_k and value["filter"] == filter_key:
+                return int(slot), float(similarities[slot])
+        return None, -1.0
+
+    def _insert(self, query: np.ndarray, top_k: int, filter_key, documents: List[Dict]):
+        if self._keys is None:
+            self._keys = np.zeros((self.capacity, query.shape[0]), dtype=np.float32)
+        if self._size < self.capacity:
+            slot = self._size
+            self._size += 1
+        else:
+            slot = int(np.argmin(self._last_used))
+        self._keys[slot] = query
+        self._values[slot] = {"top_k": top_k, "filter": filter_key, "documents": documents}
+        self._clock += 1
+        self._last_used[slot] = self._clock
+
+    def _adjust(self, region: int, delta: float):
+        self.thresholds[region] = np.clip(self.thresholds[region] + delta, self.min_threshold, self.max_threshold)
+        logger.debug("Semantic cache threshold for region %d is now %.3f", region, self.thresholds[region])
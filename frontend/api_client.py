@@ -0,0 +1,161 @@
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import orjson
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+API_URL = "http://localhost:8000"
+# connect fails fast on a dead server; read bounds the wait for each response chunk
+CONNECT_TIMEOUT = float(os.getenv("API_CONNECT_TIMEOUT", "3.05"))
+READ_TIMEOUT = float(os.getenv("API_READ_TIMEOUT", "60"))
+STATUS_TIMEOUT = (CONNECT_TIMEOUT, 3)
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# one pooled keep-alive session per process, shared by every importer; Streamlit
+# reruns re-execute the app script but not imported modules, so it survives them
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=[502, 503, 504])
+))
+
+# endpoint name -> (fetched at, value)
+_cache: Dict[str, Tuple[float, object]] = {}
+
+
+def _cached(name: str, ttl: float, fetch: Callable[[], object]):
+    now = time.monotonic()
+    hit = _cache.get(name)
+    if hit is not None and now - hit[0] < ttl:
+        return hit[1]
+    value = fetch()
+    _cache[name] = (now, value)
+    return value
+
+
+def clear_cache():
+    _cache.clear()
+
+
+def health(ttl: float = 5) -> Tuple[bool, Dict]:
+    """Return (is_healthy, /health payload), reusing a result younger than ttl seconds."""
+    return _cached("health", ttl, _fetch_health)
+
+
+def _fetch_health() -> Tuple[bool, Dict]:
+    try:
+        response = SESSION.get(f"{API_URL}/health", timeout=STATUS_TIMEOUT)
+        if response.status_code == 200:
+            data = orjson.loads(response.content)
+            return data.get("status") == "ok", data
+        return False, {}
+    except Exception as e:
+        return False, {"error": str(e)}
+
+
+def stats(ttl: float = 30) -> Optional[Dict]:
+    """Return the /stats payload or None, reusing a result younger than ttl seconds.
+
+    The payload also carries embedding_model_short and llm_model_short, the
+    model names without their organisation prefix, formatted once per fetch.
+    """
+    return _cached("stats", ttl, _fetch_stats)
+
+
+def _fetch_stats() -> Optional[Dict]:
+    try:
+        response = SESSION.get(f"{API_URL}/stats", timeout=STATUS_TIMEOUT)
+        if response.status_code == 200:
+            data = orjson.loads(response.content)
+            for key in ("embedding_model", "llm_model"):
+                data[f"{key}_short"] = data.get(key, "N/A").rsplit("/", 1)[-1]
+            return data
+        return None
+    except Exception:
+        return None
+
+
+def chat(payload: Dict) -> Dict:
+    response = SESSION.post(f"{API_URL}/chat", data=orjson.dumps(payload), headers=JSON_HEADERS,
+                            timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+    if response.status_code != 200:
+        raise RuntimeError(f"Error {response.status_code}: {response.text}")
+    return orjson.loads(response.content)
+
+
+def chat_batch(payload: Dict) -> List[Dict]:
+    response = SESSION.post(f"{API_URL}/chat/batch", data=orjson.dumps(payload), headers=JSON_HEADERS,
+                            timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+    if response.status_code != 200:
+        raise RuntimeError(f"Error {response.status_code}: {response.text}")
+    return orjson.loads(response.content)["results"]
+
+
+def stream_chat(payload: Dict) -> Iterator[Dict]:
+    """Yield server-sent events from /chat/stream: token events, then the final result."""
+    # the read timeout applies between streamed chunks, not to the whole answer
+    with SESSION.post(f"{API_URL}/chat/stream", data=orjson.dumps(payload), headers=JSON_HEADERS,
+                      stream=True, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)) as response:
+        if response.status_code != 200:
+            raise RuntimeError(f"Error {response.status_code}: {response.text}")
+        # events are parsed straight from bytes, skipping a str decode per line
+        for line in response.iter_lines():
+            if line.startswith(b"data:"):
+                yield orjson.loads(line[len(b"data:"):])
+
+
+class ExampleAnswers:
+    """Answers to fixed example questions, fetched in one /chat/batch call on a
+    background thread and reused for ttl seconds.
+
+    A failed or partial batch is logged and not kept, so the next refresh()
+    asks again; answers sampled at a non-zero temperature expire with the ttl.
+    """
+
+    def __init__(self, payload: Dict, ttl: float):
+        self.payload = payload
+        self.ttl = ttl
+        self._answers: Dict[str, Dict] = {}
+        self._fetched_at: Optional[float] = None
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _fresh(self) -> bool:
+        return self._fetched_at is not None and time.monotonic() - self._fetched_at < self.ttl
+
+    def refresh(self):
+        """Start a background fetch unless the answers are fresh or one is already running."""
+        with self._lock:
+            if self._fresh() or (self._worker is not None and self._worker.is_alive()):
+                return
+            self._worker = threading.Thread(target=self._fetch, name="example-prefetch", daemon=True)
+            self._worker.start()
+
+    def _fetch(self):
+        questions = self.payload["messages"]
+        try:
+            results = chat_batch(self.payload)
+            if len(results) != len(questions):
+                raise RuntimeError(f"Expected {len(questions)} answers, got {len(results)}")
+        except Exception as e:
+            logger.warning(f"Prefetching example answers failed: {str(e)}")
+            return
+        with self._lock:
+            self._answers = dict(zip(questions, results))
+            self._fetched_at = time.monotonic()
+
+    def get(self, question: str) -> Optional[Dict]:
+        """The prefetched answer while fresh, else None; a stale or failed prefetch is redone."""
+        with self._lock:
+            answer = self._answers.get(question) if self._fresh() else None
+        if answer is None:
+            self.refresh()
+        return answer
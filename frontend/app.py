@@ -1,9 +1,30 @@
 import streamlit as st
 import requests
-from typing import List, Dict
-import json
+import os
+import sys
+from collections import deque
+from typing import List, Dict, Tuple
+from pathlib import Path
+import threading
+import time
+from streamlit.runtime.scriptrunner import add_script_run_ctx
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from frontend import api_client
+
+STYLE_FILE = Path(__file__).parent / "style.css"
+DEFAULT_TOP_K = 5
+# rolling window of turns kept on screen and sent back as history
+MAX_TURNS = int(os.getenv("CHAT_MAX_TURNS", "20"))
+# how long prefetched example answers are reused before they are asked again
+EXAMPLE_CACHE_TTL = int(os.getenv("EXAMPLE_CACHE_TTL", "600"))
+EXAMPLE_QUESTIONS = [
+    "What are the admission requirements for Computer Science?",
+    "Tell me about the faculty in the Electrical Engineering department.",
+    "What programs are offered by the engineering departments?"
+]
 
-API_URL = "http://localhost:8000"
 
 st.set_page_config(
     page_title="UET Department Chatbot",
@@ -12,110 +33,84 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-st.markdown("""
-    <style>
-    .main {
-        background-color: #f0f2f6;
-    }
-    .stTextInput > div > div > input {
-        background-color: white;
-    }
-    .user-message {
-        background-color: #e3f2fd;
-        padding: 15px;
-        border-radius: 10px;
-        margin: 10px 0;
-        border-left: 4px solid #1976d2;
-    }
-    .user-message strong {
-        color: #0d47a1;
-    }
-    .bot-message {
-        background-color: #f5f5f5;
-        padding: 15px;
-        border-radius: 10px;
-        margin: 10px 0;
-        border-left: 4px solid #424242;
-        border: 1px solid #e0e0e0;
-    }
-    .bot-message strong {
-        color: #212121;
-    }
-    .citation {
-        background-color: #fff3e0;
-        padding: 10px;
-        border-radius: 5px;
-        margin: 5px 0;
-        font-size: 0.9em;
-        border-left: 3px solid #ff9800;
-    }
-    .status-indicator {
-        padding: 5px 10px;
-        border-radius: 5px;
-        font-weight: bold;
-    }
-    .status-ok {
-        background-color: #4CAF50;
-        color: white;
+
+@st.cache_resource
+def load_css():
+    return f"<style>{STYLE_FILE.read_text()}</style>"
+
+
+# Streamlit drops elements a rerun doesn't emit, so the tag is sent every run;
+# only the file read is cached
+st.markdown(load_css(), unsafe_allow_html=True)
+
+
+def stream_message(message: str, history: List[Dict], top_k: int = DEFAULT_TOP_K):
+    """Stream events from /chat/stream: token events, then the final result."""
+    payload = {
+        "message": message,
+        "history": history,
+        "top_k": top_k,
+        "max_tokens": 512,
+        "temperature": 0.7,
+        # only a preview is rendered and sources are never shown
+        "citations_preview_chars": 300,
+        "include_sources": False
     }
-    .status-error {
-        background-color: #f44336;
-        color: white;
+    return api_client.stream_chat(payload)
+
+
+# answered in one /chat/batch call and shared by all users for EXAMPLE_CACHE_TTL
+# seconds; a failed or partial batch raises, so it is never cached
+@st.cache_data(ttl=EXAMPLE_CACHE_TTL, show_spinner=False)
+def example_answers(top_k: int = DEFAULT_TOP_K) -> Dict[str, Dict]:
+    payload = {
+        "messages": EXAMPLE_QUESTIONS,
+        "top_k": top_k,
+        "max_tokens": 512,
+        "temperature": 0.7,
+        "citations_preview_chars": 300,
+        "include_sources": False
     }
-    </style>
-""", unsafe_allow_html=True)
+    results = api_client.chat_batch(payload)
+    if len(results) != len(EXAMPLE_QUESTIONS):
+        raise RuntimeError(f"Expected {len(EXAMPLE_QUESTIONS)} example answers, got {len(results)}")
+    return dict(zip(EXAMPLE_QUESTIONS, results))
 
 
-def check_api_health():
-    try:
-        response = requests.get(f"{API_URL}/health", timeout=5)
-        if response.status_code == 200:
-            data = response.json()
-            return data.get("status") == "ok", data
-        return False, {}
-    except Exception as e:
-        return False, {"error": str(e)}
+def prefetch_examples() -> Tuple[threading.Thread, threading.Event, float]:
+    """Warm example_answers on a background thread, so clicking an example shows
+    its answer without a round-trip; the event is set once the answers are cached."""
+    ready = threading.Event()
+    
+    def run():
+        try:
+            example_answers()
+            ready.set()
+        except Exception:
+            pass
+    
+    worker = threading.Thread(target=run, name="example-prefetch", daemon=True)
+    add_script_run_ctx(worker)
+    worker.start()
+    return worker, ready, time.monotonic()
 
 
-def send_message(message: str, history: List[Dict], top_k: int = 5):
-    try:
-        payload = {
-            "message": message,
-            "history": history,
-            "top_k": top_k,
-            "max_tokens": 512,
-            "temperature": 0.7
-        }
-        
-        response = requests.post(
-            f"{API_URL}/chat",
-            json=payload,
-            timeout=60
-        )
-        
-        if response.status_code == 200:
-            return response.json(), None
-        else:
-            return None, f"Error {response.status_code}: {response.text}"
-            
-    except requests.exceptions.Timeout:
-        return None, "Request timed out. The model might be loading or processing."
-    except Exception as e:
-        return None, f"Error: {str(e)}"
+def examples_cached(prefetch) -> bool:
+    worker, ready, started = prefetch
+    return ready.is_set() and time.monotonic() - started < EXAMPLE_CACHE_TTL
 
 
-def get_stats():
-    try:
-        response = requests.get(f"{API_URL}/stats", timeout=5)
-        if response.status_code == 200:
-            return response.json()
-        return None
-    except:
-        return None
+def ask_example(question: str):
+    st.session_state.example_question = question
 
 
 if 'messages' not in st.session_state:
-    st.session_state.messages = []
+    st.session_state.messages = deque(maxlen=2 * MAX_TURNS)
+
+# role/content only, appended per finished turn and capped at MAX_TURNS, so the
+# payload is never rebuilt from the whole conversation
+if 'api_history' not in st.session_state:
+    st.session_state.api_history = deque(maxlen=2 * MAX_TURNS)
 
 if 'api_status' not in st.session_state:
     st.session_state.api_status = None
@@ -129,7 +124,8 @@ with st.sidebar:
     
     st.subheader("System Status")
     if st.button("Check API Status", use_container_width=True):
-        is_healthy, health_data = check_api_health()
+        api_client.clear_cache()
+        is_healthy, health_data = api_client.health()
         st.session_state.api_status = (is_healthy, health_data)
     
     if st.session_state.api_status:
@@ -144,21 +140,23 @@ with st.sidebar:
     st.divider()
     
     st.subheader("Retrieval Settings")
-    top_k = st.slider("Number of context chunks", min_value=1, max_value=10, value=5)
+    top_k = st.slider("Number of context chunks", min_value=1, max_value=10, value=DEFAULT_TOP_K)
     
     st.divider()
     
-    stats = get_stats()
+    # every widget interaction reruns the script; stats are reused for 30s between reruns
+    stats = api_client.stats(ttl=30)
     if stats:
         st.subheader("📊 System Info")
         st.write(f"**Total Documents:** {stats.get('total_documents', 'N/A')}")
-        st.write(f"**Embedding Model:** {stats.get('embedding_model', 'N/A').split('/')[-1]}")
-        st.write(f"**LLM Model:** {stats.get('llm_model', 'N/A').split('/')[-1]}")
+        st.write(f"**Embedding Model:** {stats['embedding_model_short']}")
+        st.write(f"**LLM Model:** {stats['llm_model_short']}")
     
     st.divider()
     
     if st.button("🗑️ Clear Chat History", use_container_width=True):
-        st.session_state.messages = []
+        st.session_state.messages.clear()
+        st.session_state.api_history.clear()
         st.rerun()
     
     st.divider()
@@ -181,18 +179,21 @@ chat_container = st.container()
 
 with chat_container:
     for msg in st.session_state.messages:
-        if msg["role"] == "user":
-            st.markdown(f'<div class="user-message"><strong>You:</strong><br><span style="color: #212121;">{msg["content"]}</span></div>', unsafe_allow_html=True)
-        else:
-            st.markdown(f'<div class="bot-message"><strong>Assistant:</strong><br><span style="color: #212121;">{msg["content"]}</span></div>', unsafe_allow_html=True)
+        with st.chat_message(msg["role"]):
+            st.write(msg["content"])
             
-            if "citations" in msg and msg["citations"]:
+            if msg.get("citations"):
                 with st.expander(f"📚 View {len(msg['citations'])} Citations"):
                     for i, citation in enumerate(msg["citations"], 1):
-                        st.markdown(f'<div class="citation"><strong>Citation {i}:</strong><br>{citation[:300]}...</div>', unsafe_allow_html=True)
+                        st.markdown(f"**Citation {i}:**")
+                        st.text(f"{citation}...")
 
 
-user_input = st.chat_input("Ask a question about UET departments...")
+# started once per session; a prefetch that failed or expired is redone on the next rerun
+prefetch = st.session_state.get("example_prefetch")
+if prefetch is None or not (prefetch[0].is_alive() or examples_cached(prefetch)):
+    st.session_state.example_prefetch = prefetch = prefetch_examples()
+user_input = st.chat_input("Ask a question about UET departments...") or st.session_state.pop("example_question", None)
 
 if user_input:
     st.session_state.messages.append({
@@ -200,40 +201,53 @@ if user_input:
         "content": user_input
     })
     
-    with st.spinner("🤔 Thinking..."):
-        history = [
-            {"role": msg["role"], "content": msg["content"]}
-            for msg in st.session_state.messages[:-1]
-        ]
-        
-        response_data, error = send_message(user_input, history, top_k)
+    with st.chat_message("user"):
+        st.write(user_input)
+    with st.chat_message("assistant"):
+        placeholder = st.empty()
+    placeholder.write("🤔 Thinking...")
+    
+    try:
+        streamed = ""
+        response_data = None
+        if top_k == DEFAULT_TOP_K and user_input in EXAMPLE_QUESTIONS and examples_cached(prefetch):
+            response_data = example_answers().get(user_input)
+        if response_data is None:
+            response_data = {}
+            for event in stream_message(user_input, list(st.session_state.api_history), top_k):
+                if event.get("done"):
+                    response_data = event
+                else:
+                    streamed += event.get("token", "")
+                    placeholder.write(streamed)
         
-        if error:
-            st.error(f"❌ {error}")
-            st.session_state.messages.pop()
-        else:
-            answer = response_data.get("answer", "No answer generated")
-            citations = response_data.get("citations", [])
-            sources = response_data.get("sources", [])
-            
-            st.session_state.messages.append({
-                "role": "assistant",
-                "content": answer,
-                "citations": citations,
-                "sources": sources
-            })
+        # only a finished stream goes into the history
+        answer = response_data.get("answer", streamed or "No answer generated")
+        placeholder.write(answer)
+        st.session_state.messages.append({
+            "role": "assistant",
+            "content": answer,
+            "citations": response_data.get("citations", [])
+        })
+        st.session_state.api_history.append({"role": "user", "content": user_input})
+        st.session_state.api_history.append({"role": "assistant", "content": answer})
+    except requests.exceptions.Timeout:
+        placeholder.empty()
+        st.error("❌ Request timed out. The model might be loading or processing.")
+        st.session_state.messages.pop()
+    except requests.exceptions.ConnectionError:
+        placeholder.empty()
+        st.error("❌ Could not connect to the API. The model might be loading or processing.")
+        st.session_state.messages.pop()
+    except Exception as e:
+        placeholder.empty()
+        st.error(f"❌ Error: {str(e)}")
+        st.session_state.messages.pop()
 
 
 st.divider()
 
 st.markdown("**Example Questions:**")
-col1, col2, col3 = st.columns(3)
-
-with col1:
-    st.info("What are the admission requirements for Computer Science?")
-
-with col2:
-    st.info("Tell me about the faculty in the Electrical Engineering department.")
-
-with col3:
-    st.info("What programs are offered by the engineering departments?")
+for col, question in zip(st.columns(len(EXAMPLE_QUESTIONS)), EXAMPLE_QUESTIONS):
+    with col:
+        st.button(question, on_click=ask_example, args=(question,), use_container_width=True)
@@ -1,37 +1,72 @@
+import orjson
+import os
+import sys
+from pathlib import Path
 import gradio as gr
-import requests
-from typing import List, Tuple
+import httpx
+from typing import AsyncIterator, List, Tuple
 
-API_URL = "http://localhost:8000"
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from frontend import api_client
+from frontend.api_client import API_URL, CONNECT_TIMEOUT, READ_TIMEOUT, JSON_HEADERS
+
+STATS_TTL = 30
+DEFAULT_TOP_K = 5
+EXAMPLE_QUESTIONS = [
+    "What are the admission requirements for Computer Science?",
+    "Tell me about the faculty in the Electrical Engineering department.",
+    "What programs are offered by the engineering departments?"
+]
+# answers to the examples, fetched in the background and reused for
+# EXAMPLE_CACHE_TTL seconds; a failed fetch is retried on the next lookup
+EXAMPLE_CACHE_TTL = int(os.getenv("EXAMPLE_CACHE_TTL", "600"))
+EXAMPLE_ANSWERS = api_client.ExampleAnswers({
+    "messages": EXAMPLE_QUESTIONS,
+    "top_k": DEFAULT_TOP_K,
+    "citations_preview_chars": 200,
+    "include_sources": False
+}, ttl=EXAMPLE_CACHE_TTL)
+
+# async client for chat, so a long generation does not hold a Gradio worker;
+# the read timeout applies between streamed chunks, not to the whole answer
+CLIENT = httpx.AsyncClient(
+    base_url=API_URL,
+    timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+    limits=httpx.Limits(max_keepalive_connections=32)
+)
 
 def check_api_health():
-    try:
-        response = requests.get(f"{API_URL}/health", timeout=5)
-        if response.status_code == 200:
-            data = response.json()
-            return f"✓ API Online | Documents: {data.get('documents_loaded', 'N/A')}"
-        return "✗ API Offline"
-    except:
+    is_healthy, data = api_client.health()
+    if is_healthy:
+        return f"✓ API Online | Documents: {data.get('documents_loaded', 'N/A')}"
+    if "error" in data:
         return "✗ API Offline - Cannot connect"
+    return "✗ API Offline"
+
+def refresh_status():
+    api_client.clear_cache()
+    return check_api_health()
 
 def get_stats():
-    try:
-        response = requests.get(f"{API_URL}/stats", timeout=5)
-        if response.status_code == 200:
-            data = response.json()
-            return f"""
+    data = api_client.stats(ttl=STATS_TTL)
+    if data is None:
+        return "Stats unavailable"
+    return f"""
 **System Statistics:**
 - Total Documents: {data.get('total_documents', 'N/A')}
-- Embedding Model: {data.get('embedding_model', 'N/A').split('/')[-1]}
-- LLM Model: {data.get('llm_model', 'N/A').split('/')[-1]}
+- Embedding Model: {data['embedding_model_short']}
+- LLM Model: {data['llm_model_short']}
 """
-        return "Stats unavailable"
-    except:
-        return "Stats unavailable"
 
-def chat(message: str, history: List[Tuple[str, str]], top_k: int) -> Tuple[List[Tuple[str, str]], str]:
+def refresh_stats():
+    api_client.clear_cache()
+    return get_stats()
+
+async def chat(message: str, history: List[Tuple[str, str]], top_k: int) -> AsyncIterator[Tuple[List[Tuple[str, str]], str]]:
     if not message.strip():
-        return history, ""
+        yield history, ""
+        return
     
     try:
         history_for_api = []
@@ -39,35 +74,55 @@ def chat(message: str, history: List[Tuple[str, str]], top_k: int) -> Tuple[List
             history_for_api.append({"role": "user", "content": user_msg})
             history_for_api.append({"role": "assistant", "content": bot_msg})
         
+        cached = EXAMPLE_ANSWERS.get(message) if top_k == DEFAULT_TOP_K and message in EXAMPLE_QUESTIONS else None
+        if cached is not None:
+            history.append((message, with_citations(cached.get("answer", "No answer generated"), cached.get("citations", []))))
+            yield history, ""
+            return
+        
         payload = {
             "message": message,
             "history": history_for_api,
-            "top_k": top_k
+            "top_k": top_k,
+            # only a preview is rendered and sources are never shown
+            "citations_preview_chars": 200,
+            "include_sources": False
         }
         
-        response = requests.post(f"{API_URL}/chat", json=payload, timeout=60)
-        
-        if response.status_code == 200:
-            data = response.json()
-            answer = data.get("answer", "No answer generated")
-            citations = data.get("citations", [])
+        async with CLIENT.stream("POST", "/chat/stream", content=orjson.dumps(payload), headers=JSON_HEADERS) as response:
+            if response.status_code != 200:
+                history.append((message, f"Error: {response.status_code}"))
+                yield history, ""
+                return
             
-            if citations:
-                answer += f"\n\n**Citations ({len(citations)}):**\n"
-                for i, citation in enumerate(citations[:3], 1):
-                    answer += f"\n{i}. {citation[:200]}...\n"
-            
-            history.append((message, answer))
-            return history, ""
-        else:
-            error_msg = f"Error: {response.status_code}"
-            history.append((message, error_msg))
-            return history, ""
+            answer = ""
+            data = {}
+            async for line in response.aiter_lines():
+                if not line or not line.startswith("data:"):
+                    continue
+                event = orjson.loads(line[len("data:"):])
+                if event.get("done"):
+                    data = event
+                else:
+                    answer += event.get("token", "")
+                    yield history + [(message, answer)], ""
+        
+        answer = with_citations(data.get("answer", answer or "No answer generated"), data.get("citations", []))
+        
+        history.append((message, answer))
+        yield history, ""
             
     except Exception as e:
         error_msg = f"Error: {str(e)}"
         history.append((message, error_msg))
-        return history, ""
+        yield history, ""
+
+def with_citations(answer: str, citations: List[str]) -> str:
+    if citations:
+        answer += f"\n\n**Citations ({len(citations)}):**\n"
+        for i, citation in enumerate(citations[:3], 1):
+            answer += f"\n{i}. {citation}...\n"
+    return answer
 
 with gr.Blocks(theme=gr.themes.Soft(primary_hue="blue", secondary_hue="slate"), title="UET Department Chatbot") as demo:
     gr.Markdown("""
@@ -97,12 +152,7 @@ with gr.Blocks(theme=gr.themes.Soft(primary_hue="blue", secondary_hue="slate"),
             with gr.Row():
                 clear = gr.Button("Clear Chat")
             
-            gr.Markdown("""
-            **Example Questions:**
-            - What are the admission requirements for Computer Science?
-            - Tell me about the faculty in the Electrical Engineering department.
-            - What programs are offered by the engineering departments?
-            """)
+            gr.Examples(examples=EXAMPLE_QUESTIONS, inputs=msg, label="Example Questions")
         
         with gr.Column(scale=1):
             gr.Markdown("### ⚙️ Settings")
@@ -117,7 +167,7 @@ with gr.Blocks(theme=gr.themes.Soft(primary_hue="blue", secondary_hue="slate"),
             top_k = gr.Slider(
                 minimum=1,
                 maximum=10,
-                value=5,
+                value=DEFAULT_TOP_K,
                 step=1,
                 label="Context Chunks",
                 info="Number of document chunks to retrieve"
@@ -140,8 +190,9 @@ with gr.Blocks(theme=gr.themes.Soft(primary_hue="blue", secondary_hue="slate"),
     submit.click(chat, inputs=[msg, chatbot, top_k], outputs=[chatbot, msg])
     msg.submit(chat, inputs=[msg, chatbot, top_k], outputs=[chatbot, msg])
     clear.click(lambda: [], outputs=[chatbot])
-    refresh_btn.click(check_api_health, outputs=[status])
-    refresh_stats_btn.click(get_stats, outputs=[stats])
+    refresh_btn.click(refresh_status, outputs=[status])
+    refresh_stats_btn.click(refresh_stats, outputs=[stats])
 
 if __name__ == "__main__":
+    EXAMPLE_ANSWERS.refresh()
     demo.launch(server_name="0.0.0.0", server_port=7860, share=False)
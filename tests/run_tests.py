@@ -1,53 +1,163 @@
-import json
+import asyncio
+import hashlib
+import orjson
+import os
+import random
+import sqlite3
 import sys
 from pathlib import Path
-import requests
+import httpx
 from datetime import datetime
 import time
 
-sys.path.append(str(Path(__file__).resolve().parent.parent))
+from frontend import api_client
+from frontend.api_client import API_URL, CONNECT_TIMEOUT, READ_TIMEOUT, JSON_HEADERS
 
-API_URL = "http://localhost:8000"
 TEST_QUERIES_FILE = Path(__file__).parent / "test_queries.json"
-TEST_RESULTS_FILE = Path(__file__).parent / "test_results.json"
+# one JSON record per line, appended as each question finishes, so a crashed
+# run keeps its progress and `--resume` can skip finished questions
+TEST_RESULTS_FILE = Path(__file__).parent / "test_results.ndjson"
+TEST_SUMMARY_FILE = Path(__file__).parent / "test_summary.json"
+# concurrent questions in flight; the server micro-batches their query embeddings,
+# and vLLM batches generation, but the transformers backend generates one at a time
+MAX_WORKERS = 8
+RESUME = "--resume" in sys.argv[1:]
+TOP_K = 5
+# opt-in with ANSWER_CACHE=1: answers are reused across runs until the models,
+# the backend code or the vector store change; RETEST=1 asks every question
+# again and refreshes the cache
+USE_ANSWER_CACHE = os.getenv("ANSWER_CACHE", "0") == "1"
+ANSWER_CACHE_FILE = Path(__file__).parent / ".cache" / "answers.sqlite"
+FORCE_REFRESH = os.getenv("RETEST", "0") == "1"
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+VECTOR_STORE_FILE = Path(__file__).resolve().parent.parent / "data" / "chroma_db" / "chroma.sqlite3"
+# only connection failures and 5xx responses are retried; a slow answer gets the
+# full READ_TIMEOUT, since a resent question would queue behind the one still
+# generating on the server
+MAX_ATTEMPTS = 3
+RETRY_INITIAL_WAIT = 0.5
+RETRY_MAX_WAIT = 4
 
 
 def check_api_health():
-    try:
-        response = requests.get(f"{API_URL}/health", timeout=5)
-        if response.status_code == 200:
-            data = response.json()
-            return data.get("status") == "ok", data
-        return False, {}
-    except Exception as e:
-        return False, {"error": str(e)}
+    return api_client.health(ttl=0)
 
 
-def send_question(question: str, timeout: int = 60):
-    try:
-        payload = {
-            "message": question,
-            "history": [],
-            "top_k": 5,
-            "max_tokens": 512,
-            "temperature": 0.7
-        }
-        
-        response = requests.post(
-            f"{API_URL}/chat",
-            json=payload,
-            timeout=timeout
-        )
-        
-        if response.status_code == 200:
-            return response.json(), None
+def get_model_version():
+    """Identify the serving models and corpus, so cached answers expire when either changes."""
+    stats = api_client.stats(ttl=0)
+    if stats is None:
+        return None
+    return f"{stats.get('embedding_model')}+{stats.get('llm_model')}+{stats.get('total_documents')}+{get_code_version()}"
+
+
+def get_code_version():
+    """Hash the backend sources (prompts, guardrail, retrieval, chunking) and the
+    vector store's last write, so a change to any of them misses the cache."""
+    digest = hashlib.blake2b(digest_size=16)
+    for path in sorted(BACKEND_DIR.rglob("*.py")):
+        digest.update(path.relative_to(BACKEND_DIR).as_posix().encode())
+        digest.update(path.read_bytes())
+    if VECTOR_STORE_FILE.exists():
+        stat = VECTOR_STORE_FILE.stat()
+        digest.update(f"{stat.st_mtime_ns}:{stat.st_size}".encode())
+    return digest.hexdigest()
+
+
+def open_answer_cache():
+    ANSWER_CACHE_FILE.parent.mkdir(exist_ok=True)
+    cache = sqlite3.connect(ANSWER_CACHE_FILE)
+    cache.execute("CREATE TABLE IF NOT EXISTS answers (key TEXT PRIMARY KEY, response BLOB NOT NULL)")
+    return cache
+
+
+def answer_key(question: str, model_version: str, top_k: int = TOP_K):
+    return hashlib.blake2b(f"{question}|{top_k}|{model_version}".encode(), digest_size=16).hexdigest()
+
+
+async def send_question(client: httpx.AsyncClient, question: str, timeout: float = READ_TIMEOUT):
+    """POST one question to /chat; returns (response_data, error, retries)."""
+    payload = {
+        "message": question,
+        "history": [],
+        "top_k": TOP_K,
+        "max_tokens": 512,
+        "temperature": 0.7
+    }
+    
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            response = await client.post(
+                "/chat",
+                content=orjson.dumps(payload),
+                headers=JSON_HEADERS,
+                timeout=httpx.Timeout(timeout, connect=CONNECT_TIMEOUT)
+            )
+        except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+            error = f"Error: {str(e)}"
+        except httpx.TimeoutException:
+            return None, "Request timed out", attempt
+        except Exception as e:
+            return None, f"Error: {str(e)}", attempt
         else:
-            return None, f"Error {response.status_code}: {response.text}"
-            
-    except requests.exceptions.Timeout:
-        return None, "Request timed out"
-    except Exception as e:
-        return None, f"Error: {str(e)}"
+            if response.status_code == 200:
+                return orjson.loads(response.content), None, attempt
+            error = f"Error {response.status_code}: {response.text}"
+            if response.status_code < 500:
+                return None, error, attempt
+        
+        if attempt == MAX_ATTEMPTS - 1:
+            return None, error, attempt
+        # exponential backoff with jitter, so retries of a burst do not land together
+        await asyncio.sleep(min(RETRY_MAX_WAIT, RETRY_INITIAL_WAIT * 2 ** attempt + random.uniform(0, 1)))
+
+
+async def send_questions(questions, model_version=None, on_result=None):
+    """Send every question concurrently, at most MAX_WORKERS in flight; returns results in order.
+    
+    With a model_version, answers cached by an earlier run of the same models are
+    returned without calling the API, and new successful answers are stored.
+    With on_result, each (index, outcome) is handed to it as soon as it completes
+    and nothing is kept for the return value.
+    """
+    limit = asyncio.Semaphore(MAX_WORKERS)
+    cache = open_answer_cache() if model_version else None
+    
+    def lookup(question):
+        if cache is None or FORCE_REFRESH:
+            return None
+        row = cache.execute("SELECT response FROM answers WHERE key = ?", (answer_key(question, model_version),)).fetchone()
+        return orjson.loads(row[0]) if row else None
+    
+    async def timed_send(client, index, question):
+        outcome = await answer(client, question)
+        if on_result is None:
+            return outcome
+        on_result(index, outcome)
+    
+    async def answer(client, question):
+        start_time = time.perf_counter()
+        response_data = lookup(question)
+        if response_data is not None:
+            return response_data, None, time.perf_counter() - start_time, 0
+        async with limit:
+            start_time = time.perf_counter()
+            response_data, error, retries = await send_question(client, question)
+            elapsed_time = time.perf_counter() - start_time
+        if cache is not None and error is None:
+            cache.execute(
+                "INSERT OR REPLACE INTO answers (key, response) VALUES (?, ?)",
+                (answer_key(question, model_version), orjson.dumps(response_data))
+            )
+        return response_data, error, elapsed_time, retries
+    
+    try:
+        async with httpx.AsyncClient(base_url=API_URL, limits=httpx.Limits(max_keepalive_connections=MAX_WORKERS)) as client:
+            return await asyncio.gather(*(timed_send(client, index, question) for index, question in enumerate(questions)))
+    finally:
+        if cache is not None:
+            cache.commit()
+            cache.close()
 
 
 def run_tests():
@@ -71,8 +181,8 @@ def run_tests():
     print()
     
     print("Step 2: Loading test queries...")
-    with open(TEST_QUERIES_FILE, 'r', encoding='utf-8') as f:
-        test_data = json.load(f)
+    with open(TEST_QUERIES_FILE, 'rb') as f:
+        test_data = orjson.loads(f.read())
     
     all_questions = []
     all_questions.extend(test_data['department_related_questions'])
@@ -88,104 +198,153 @@ def run_tests():
     print("Step 3: Running tests...")
     print("=" * 80)
     
-    results = {
-        "test_run_timestamp": datetime.now().isoformat(),
-        "total_questions": len(all_questions),
-        "results": [],
-        "summary": {
-            "passed": 0,
-            "failed": 0,
-            "guardrail_triggered": 0
-        }
+    summary = {
+        "passed": 0,
+        "failed": 0,
+        "guardrail_triggered": 0,
+        "retries": 0
     }
     
-    for i, test_case in enumerate(all_questions, 1):
-        question_id = test_case['id']
-        category = test_case['category']
-        question = test_case['question']
-        expected_behavior = test_case['expected_behavior']
-        
-        print(f"\n[Test {i}/{len(all_questions)}] Question {question_id} ({category})")
-        print(f"Q: {question}")
-        print("-" * 80)
-        
-        start_time = time.time()
-        response_data, error = send_question(question)
-        elapsed_time = time.time() - start_time
-        
-        if error:
-            print(f"❌ FAILED: {error}")
-            results['results'].append({
-                "question_id": question_id,
-                "category": category,
-                "question": question,
-                "status": "failed",
-                "error": error,
-                "elapsed_time": elapsed_time
-            })
-            results['summary']['failed'] += 1
-            continue
-        
-        answer = response_data.get('answer', '')
-        citations = response_data.get('citations', [])
-        metadata = response_data.get('metadata', {})
-        guardrail_triggered = metadata.get('guardrail_triggered', False)
-        
-        print(f"A: {answer[:200]}{'...' if len(answer) > 200 else ''}")
-        print(f"Citations: {len(citations)}")
-        print(f"Guardrail triggered: {guardrail_triggered}")
-        print(f"Time: {elapsed_time:.2f}s")
-        
-        if category == "out_of_scope":
-            if guardrail_triggered and "I only answer department information" in answer:
-                print("✓ PASSED: Guardrail correctly triggered")
-                status = "passed"
-                results['summary']['passed'] += 1
-                results['summary']['guardrail_triggered'] += 1
-            else:
-                print("❌ FAILED: Guardrail should have triggered")
-                status = "failed"
-                results['summary']['failed'] += 1
-        else:
-            if not guardrail_triggered and len(citations) > 0:
-                print("✓ PASSED: Answer generated with citations")
-                status = "passed"
-                results['summary']['passed'] += 1
-            else:
-                print("⚠ WARNING: Answer generated but may need review")
-                status = "passed"
-                results['summary']['passed'] += 1
+    done_ids = set()
+    if RESUME:
+        for record in read_results():
+            done_ids.add(record['question_id'])
+            tally(summary, record)
+        print(f"Resuming: {len(done_ids)} questions already completed")
+    pending = [test_case for test_case in all_questions if test_case['id'] not in done_ids]
+    
+    model_version = get_model_version() if USE_ANSWER_CACHE else None
+    if USE_ANSWER_CACHE and model_version is None:
+        print("⚠ Could not read /stats; answer cache disabled for this run")
+    elif USE_ANSWER_CACHE and FORCE_REFRESH:
+        print("RETEST=1: refreshing cached answers")
+    
+    suite_start = time.perf_counter()
+    with open(TEST_RESULTS_FILE, 'ab' if RESUME else 'wb') as results_file:
+        def on_result(index, outcome):
+            record = report_result(len(done_ids) + index + 1, pending[index], outcome, len(all_questions))
+            results_file.write(orjson.dumps(record) + b"\n")
+            results_file.flush()
+            tally(summary, record)
         
-        results['results'].append({
-            "question_id": question_id,
-            "category": category,
-            "question": question,
-            "answer": answer,
-            "citations_count": len(citations),
-            "guardrail_triggered": guardrail_triggered,
-            "status": status,
-            "elapsed_time": elapsed_time,
-            "expected_behavior": expected_behavior
-        })
+        asyncio.run(send_questions([test_case['question'] for test_case in pending], model_version, on_result))
+    suite_time = time.perf_counter() - suite_start
     
     print("\n" + "=" * 80)
     print("TEST SUMMARY")
     print("=" * 80)
-    print(f"Total Questions: {results['total_questions']}")
-    print(f"Passed: {results['summary']['passed']}")
-    print(f"Failed: {results['summary']['failed']}")
-    print(f"Guardrail Triggered: {results['summary']['guardrail_triggered']}")
-    print(f"Success Rate: {(results['summary']['passed'] / results['total_questions'] * 100):.1f}%")
+    print(f"Total Questions: {len(all_questions)}")
+    print(f"Passed: {summary['passed']}")
+    print(f"Failed: {summary['failed']}")
+    print(f"Guardrail Triggered: {summary['guardrail_triggered']}")
+    print(f"Retries: {summary['retries']}")
+    print(f"Success Rate: {(summary['passed'] / len(all_questions) * 100):.1f}%")
+    print(f"Total Time: {suite_time:.2f}s ({MAX_WORKERS} concurrent requests)")
     print()
     
-    print(f"Saving results to {TEST_RESULTS_FILE}...")
-    with open(TEST_RESULTS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"Results written to {TEST_RESULTS_FILE}")
+    with open(TEST_SUMMARY_FILE, 'wb') as f:
+        f.write(orjson.dumps({
+            "test_run_timestamp": datetime.now().isoformat(),
+            "total_questions": len(all_questions),
+            "summary": summary,
+            "success_rate": summary['passed'] / len(all_questions),
+            "total_time": suite_time
+        }, option=orjson.OPT_INDENT_2))
     
-    print("✓ Results saved successfully")
+    print(f"✓ Summary saved to {TEST_SUMMARY_FILE}")
     print()
     
-    return results['summary']['failed'] == 0
+    return summary['failed'] == 0
+
+
+def read_results():
+    """Return the records of an earlier run, truncating a line cut off by a crash."""
+    records = []
+    if not TEST_RESULTS_FILE.exists():
+        return records
+    with open(TEST_RESULTS_FILE, 'r+b') as f:
+        valid_end = 0
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                records.append(orjson.loads(line))
+            except orjson.JSONDecodeError:
+                break
+            valid_end += len(line)
+        f.truncate(valid_end)
+    return records
+
+
+def tally(summary: dict, record: dict):
+    summary[record['status']] += 1
+    summary['retries'] += record.get('retries', 0)
+    if record['status'] == "passed" and record['category'] == "out_of_scope":
+        summary['guardrail_triggered'] += 1
+
+
+def report_result(i: int, test_case: dict, outcome, total: int) -> dict:
+    """Print one question's outcome and return its result record."""
+    response_data, error, elapsed_time, retries = outcome
+    question_id = test_case['id']
+    category = test_case['category']
+    question = test_case['question']
+    expected_behavior = test_case['expected_behavior']
+    
+    print(f"\n[Test {i}/{total}] Question {question_id} ({category})")
+    print(f"Q: {question}")
+    print("-" * 80)
+    
+    if error:
+        print(f"❌ FAILED: {error}")
+        return {
+            "question_id": question_id,
+            "category": category,
+            "question": question,
+            "status": "failed",
+            "error": error,
+            "elapsed_time": elapsed_time,
+            "retries": retries
+        }
+    
+    answer = response_data.get('answer', '')
+    citations = response_data.get('citations', [])
+    metadata = response_data.get('metadata', {})
+    guardrail_triggered = metadata.get('guardrail_triggered', False)
+    
+    print(f"A: {answer[:200]}{'...' if len(answer) > 200 else ''}")
+    print(f"Citations: {len(citations)}")
+    print(f"Guardrail triggered: {guardrail_triggered}")
+    print(f"Time: {elapsed_time:.2f}s" + (f" ({retries} retries)" if retries else ""))
+    
+    if category == "out_of_scope":
+        if guardrail_triggered and "I only answer department information" in answer:
+            print("✓ PASSED: Guardrail correctly triggered")
+            status = "passed"
+        else:
+            print("❌ FAILED: Guardrail should have triggered")
+            status = "failed"
+    else:
+        if not guardrail_triggered and len(citations) > 0:
+            print("✓ PASSED: Answer generated with citations")
+            status = "passed"
+        else:
+            print("⚠ WARNING: Answer generated but may need review")
+            status = "passed"
+    
+    return {
+        "question_id": question_id,
+        "category": category,
+        "question": question,
+        "answer": answer,
+        "citations_count": len(citations),
+        "guardrail_triggered": guardrail_triggered,
+        "status": status,
+        "elapsed_time": elapsed_time,
+        "retries": retries,
+        "expected_behavior": expected_behavior
+    }
 
 
 if __name__ == "__main__":
@@ -1,17 +1,26 @@
 import pytest
 import sys
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-sys.path.append(str(Path(__file__).resolve().parent.parent))
-
-from backend.preprocessing.pdf_extractor import PDFExtractor
+# PDFExtractor (pypdfium2), TextEmbedder (torch) and VectorStore (chromadb) are
+# imported inside the tests that use them, so `pytest -k cleaning` skips their startup
 from backend.preprocessing.text_cleaner import TextCleaner
 from backend.preprocessing.chunker import TextChunker
-from backend.preprocessing.embedder import TextEmbedder
+from backend.preprocessing.embedding_cache import EmbeddingCache
 from backend.config import PDF_PATH
 
 
+@pytest.fixture(scope="session")
+def embedder():
+    from backend.preprocessing.embedder import TextEmbedder
+    return TextEmbedder()
+
+
 def test_pdf_extraction():
+    from backend.preprocessing.pdf_extractor import PDFExtractor
+    
     extractor = PDFExtractor(PDF_PATH)
     text = extractor.extract_text()
     
@@ -36,17 +45,25 @@ def test_text_cleaning():
 def test_chunking():
     chunker = TextChunker(chunk_size=100, overlap=20)
     
-    text = " ".join([f"word{i}" for i in range(500)])
+    total_words = 500
+    text = " ".join(f"word{i}" for i in range(total_words))
     chunks = chunker.chunk_by_words(text)
+    windows = chunker.word_windows(total_words)
     
-    assert len(chunks) > 0
-    assert all(len(chunk.split()) <= 100 for chunk in chunks)
+    words = text.split()
+    
+    # 500 words with a step of 80: spans start at 0, 80, ..., 400 and the last one ends at 500
+    assert len(chunks) == len(windows) == 6
+    assert [start for start, _ in windows] == list(range(0, 401, 80))
+    assert all(end - start == 100 for start, end in windows)
+    assert windows[-1][1] == total_words
+    assert chunks == [" ".join(words[start:end]) for start, end in windows]
+    for previous, current in zip(chunks, chunks[1:]):
+        assert previous.split()[-20:] == current.split()[:20], "Consecutive chunks should overlap by 20 words"
     print(f"✓ Chunking successful: {len(chunks)} chunks created")
 
 
-def test_embedding_generation():
-    embedder = TextEmbedder()
-    
+def test_embedding_generation(embedder):
     test_texts = [
         "Computer Science department offers various programs.",
         "Electrical Engineering has excellent faculty."
@@ -54,23 +71,161 @@ def test_embedding_generation():
     
     embeddings = embedder.embed_batch(test_texts, show_progress=False)
     
-    assert len(embeddings) == len(test_texts)
-    assert embeddings[0].shape[0] == embedder.get_embedding_dimension()
-    print(f"✓ Embedding generation successful: {embeddings[0].shape}")
+    # one contiguous float32 block, not a list of per-text vectors
+    assert isinstance(embeddings, np.ndarray)
+    assert embeddings.dtype == np.float32
+    assert embeddings.shape == (len(test_texts), embedder.get_embedding_dimension())
+    assert embeddings.flags.c_contiguous
+    print(f"✓ Embedding generation successful: {embeddings.shape}")
 
 
-if __name__ == "__main__":
-    print("Running preprocessing tests...\n")
+def test_embedding_batcher(embedder):
+    from backend.preprocessing.embedder import EmbeddingBatcher
+    
+    batcher = EmbeddingBatcher(embedder, max_batch_size=8, max_wait_ms=20)
+    
+    queries = [f"What programs does department {i} offer?" for i in range(16)]
     
     try:
-        test_pdf_extraction()
-        test_text_cleaning()
-        test_chunking()
-        test_embedding_generation()
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            batched = list(pool.map(batcher.embed_text, queries))
+    finally:
+        batcher.close()
+    
+    for query, embedding in zip(queries, batched):
+        assert embedding.shape[0] == embedder.get_embedding_dimension()
+        assert abs(embedding - embedder.embed_text(query)).max() < 1e-4
+    
+    with pytest.raises(RuntimeError):
+        batcher.embed_text(queries[0])
+    print(f"✓ Embedding batcher successful: {len(batched)} queries")
+
+
+def test_embedding_cache(embedder, tmp_path):
+    cache = EmbeddingCache(tmp_path, embedder.model_name)
+    
+    texts = [
+        "Computer Science department offers various programs.",
+        "Electrical Engineering has excellent faculty."
+    ]
+    
+    first = cache.embed(embedder, texts, show_progress=False)
+    matrix, keys = cache.load_matrix()
+    assert matrix.shape == (len(texts), embedder.get_embedding_dimension())
+    assert keys == [cache.key(text) for text in texts]
+    assert EmbeddingCache(tmp_path, "model-a").key("bc") != EmbeddingCache(tmp_path, "model-ab").key("c")
+    
+    second = cache.embed(embedder, texts, show_progress=False)
+    assert second.shape == first.shape
+    assert abs(second - first).max() == 0
+    
+    extended = cache.embed(embedder, texts[::-1] + ["Mechanical Engineering admissions."], show_progress=False)
+    assert abs(extended[:2] - first[::-1]).max() == 0
+    print(f"✓ Embedding cache successful: {second.shape}")
+
+
+def test_vector_store_brute_force_matches_chroma(tmp_path):
+    from backend.preprocessing.vector_store import VectorStore
+    
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(200, 32)).astype(np.float32)
+    metadatas = [{"chunk_id": i, "has_faculty": i % 3 == 0} for i in range(len(embeddings))]
+    
+    store = VectorStore(persist_directory=str(tmp_path), collection_name="brute_force_test")
+    store.add_documents(
+        documents=[f"document {i}" for i in range(len(embeddings))],
+        metadatas=metadatas,
+        ids=[f"chunk_{i}" for i in range(len(embeddings))],
+        embeddings=embeddings
+    )
+    
+    for where in (None, {"has_faculty": True}):
+        query = embeddings[7] + rng.normal(scale=0.05, size=32).astype(np.float32)
+        store.brute_force = True
+        exact = store.query(n_results=5, query_embeddings=query, where=where)
+        store.brute_force = False
+        hnsw = store.query(n_results=5, query_embeddings=query, where=where)
         
-        print("\n" + "="*50)
-        print("All preprocessing tests passed! ✓")
-        print("="*50)
-    except Exception as e:
-        print(f"\n✗ Test failed: {e}")
-        raise
+        assert exact['ids'][0][0] == hnsw['ids'][0][0]
+        assert np.allclose(exact['distances'][0], hnsw['distances'][0], atol=1e-2)
+    
+    assert "has_faculty" in store._flag_bitmaps
+    for value in (True, False):
+        expected = [i for i, meta in enumerate(metadatas) if meta["has_faculty"] == value]
+        assert store._filter_rows({"has_faculty": value}).tolist() == expected
+    
+    print(f"✓ Brute-force search matches Chroma: {exact['ids'][0]}")
+
+
+def test_vector_store_empty_query(tmp_path):
+    from backend.preprocessing.vector_store import VectorStore
+    
+    store = VectorStore(persist_directory=str(tmp_path), collection_name="empty_test")
+    query = np.ones(16, dtype=np.float32)
+    
+    assert store.query(n_results=3, query_embeddings=query)['ids'] == [[]]
+    assert store.batch_query(np.stack([query, query]), n_results=3)['ids'] == [[], []]
+    
+    print(f"✓ Empty vector store returns empty results")
+
+
+def test_vector_store_batch_query_keeps_input(tmp_path):
+    from backend.preprocessing.vector_store import VectorStore
+    
+    # 64 columns need no padding, so the store sees the caller's array itself
+    rng = np.random.default_rng(2)
+    embeddings = rng.normal(size=(20, 64)).astype(np.float32)
+    store = VectorStore(persist_directory=str(tmp_path), collection_name="batch_input_test")
+    store.add_documents(documents=[f"document {i}" for i in range(len(embeddings))], embeddings=embeddings)
+    
+    queries = embeddings[:3] * 3
+    before = queries.copy()
+    results = store.batch_query(queries, n_results=2)
+    
+    assert np.array_equal(queries, before), "batch_query should not normalize the caller's embeddings"
+    assert [row[0] for row in results['ids']] == ["doc_0", "doc_1", "doc_2"]
+    
+    print(f"✓ Batch query left its input untouched")
+
+
+def test_vector_store_sidecar_reload(tmp_path):
+    from backend.preprocessing.vector_store import VectorStore
+    
+    rng = np.random.default_rng(1)
+    embeddings = rng.normal(size=(50, 16)).astype(np.float32)
+    
+    store = VectorStore(persist_directory=str(tmp_path), collection_name="sidecar_test")
+    store.add_documents(
+        documents=[f"document {i}" for i in range(len(embeddings))],
+        ids=[f"chunk_{i}" for i in range(len(embeddings))],
+        embeddings=embeddings
+    )
+    first = store.query(n_results=3, query_embeddings=embeddings[3])
+    assert (tmp_path / "sidecar_test.matrix.npy").exists()
+    
+    reopened = VectorStore(persist_directory=str(tmp_path), collection_name="sidecar_test")
+    assert reopened._load_sidecar(), "Sidecar should be reused while the collection is unchanged"
+    assert reopened.query(n_results=3, query_embeddings=embeddings[3]) == first
+    
+    # a rewrite from another client that keeps the count must not serve the old matrix
+    writer = VectorStore(persist_directory=str(tmp_path), collection_name="sidecar_test")
+    writer.collection.delete(ids=["chunk_0"])
+    writer.collection.add(ids=["chunk_replaced"], documents=["replaced"], embeddings=embeddings[:1].tolist())
+    assert not VectorStore(persist_directory=str(tmp_path), collection_name="sidecar_test")._load_sidecar()
+    
+    writes = []
+    reopened.add_write_listener(lambda: writes.append(True))
+    reopened.add_documents(documents=["new document"], ids=["chunk_new"], embeddings=embeddings[:1])
+    assert writes, "Write listeners should run so retrieval caches get cleared"
+    assert not (tmp_path / "sidecar_test.matrix.npy").exists()
+    assert len(reopened.query(n_results=100, query_embeddings=embeddings[3])['ids'][0]) == 51
+    assert reopened.get_count() == reopened.collection.count() == 51
+    assert reopened.has_any()
+    reopened.reset_collection()
+    assert not reopened.has_any()
+    
+    print(f"✓ Brute-force sidecar reload successful")
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-x", "--tb=short", "-q"]))
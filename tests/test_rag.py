@@ -1,81 +1,179 @@
+import os
 import pytest
 import sys
+import numpy as np
 from pathlib import Path
 
-sys.path.append(str(Path(__file__).resolve().parent.parent))
+# backend.rag.retriever pulls in chromadb and torch, so it is imported inside the
+# retriever fixture; `pytest --collect-only` and `-k semantic_cache` skip that cost
+from backend.rag.semantic_cache import SemanticCache
+from backend.rag.query_classifier import classify_query
+from backend.preprocessing.embedding_cache import EmbeddingCache
+from backend.config import CHROMA_DB_DIR, EMBEDDING_MODEL
 
-from backend.rag.retriever import Retriever
-from backend.config import CHROMA_DB_DIR
 
+# extra diagnostics that cost store reads, e.g. the document count
+VERBOSE = os.getenv("TEST_VERBOSE", "False").lower() in ("1", "true", "yes")
 
-def test_retriever_initialization():
-    try:
-        retriever = Retriever()
-        doc_count = retriever.vector_store.get_count()
-        
-        assert doc_count > 0, "Vector store should contain documents"
-        print(f"✓ Retriever initialized with {doc_count} documents")
-    except Exception as e:
-        print(f"✗ Make sure to run preprocessing pipeline first!")
-        raise
+# name -> (query, top_k)
+RETRIEVAL_QUERIES = {
+    "admissions": ("What are the admission requirements?", 5),
+    "programs": ("Tell me about Computer Science programs", 3),
+    "relevance": ("Computer Science department programs", 3)
+}
+
+# float32 embeddings of the test queries kept between runs (CI can cache this
+# directory); one subdirectory per model, so switching EMBEDDING_MODEL re-embeds them
+QUERY_EMBEDDING_CACHE_DIR = Path(__file__).parent / ".cache" / "query_embeddings" / EMBEDDING_MODEL.replace("/", "--")
+
+
+def prime_query_embeddings(retriever):
+    # load the test queries' embeddings from disk into the retriever's exact-text
+    # cache, so retrieve_many skips the forward pass; only misses are embedded
+    expanded_queries = [retriever.expand_query(query) for query, _ in RETRIEVAL_QUERIES.values()]
+    cache = EmbeddingCache(QUERY_EMBEDDING_CACHE_DIR, EMBEDDING_MODEL, dtype=np.float32)
+    embeddings = cache.embed(retriever.embedder, expanded_queries, show_progress=False)
+    retriever.prime_embeddings(expanded_queries, embeddings)
 
 
-def test_retrieval():
+def retrieve_test_queries(retriever):
+    # one batched retrieval per distinct top_k, so every query is searched at its
+    # own top_k exactly as retrieve(query, top_k) would instead of a truncated max_k
+    by_top_k = {}
+    for name, (query, top_k) in RETRIEVAL_QUERIES.items():
+        by_top_k.setdefault(top_k, []).append((name, query))
+    results = {}
+    for top_k, entries in by_top_k.items():
+        documents = retriever.retrieve_many([query for _, query in entries], top_k=top_k)
+        results.update({name: docs for (name, _), docs in zip(entries, documents)})
+    return results
+
+
+@pytest.fixture(scope="session")
+def retriever():
+    # a stat() is enough to tell the pipeline never ran; skip before paying
+    # for the embedding model and the collection load
+    if not (CHROMA_DB_DIR / "chroma.sqlite3").exists():
+        pytest.skip("Vector store not built; run: python -m backend.preprocessing.run_pipeline")
+    pytest.importorskip("chromadb")
+    pytest.importorskip("sentence_transformers")
+    from backend.rag.retriever import Retriever
+    # opening the collection and loading the embedding model happens once
     retriever = Retriever()
+    # page the search index in now, not inside the first test that queries it
+    retriever.vector_store.warm_up()
+    prime_query_embeddings(retriever)
+    return retriever
+
+
+@pytest.fixture(scope="session")
+def batched_results(retriever):
+    return retrieve_test_queries(retriever)
+
+
+def test_retriever_initialization(retriever):
+    assert retriever.vector_store.has_any(), "Vector store should contain documents"
+    if VERBOSE:
+        print(f"✓ Retriever initialized with {retriever.vector_store.refresh_count()} documents")
+    else:
+        print("✓ Retriever initialized with a non-empty vector store")
+
+
+@pytest.mark.parametrize("name", list(RETRIEVAL_QUERIES))
+def test_retrieval(batched_results, name):
+    query, top_k = RETRIEVAL_QUERIES[name]
+    documents = batched_results[name]
     
-    query = "What are the admission requirements?"
-    results = retriever.retrieve(query, top_k=5)
-    
-    assert results['count'] > 0, "Should retrieve at least one document"
-    assert len(results['documents']) <= 5, "Should not exceed top_k"
-    assert all(isinstance(doc, str) for doc in results['documents'])
+    assert len(documents) > 0, "Should retrieve at least one document"
+    assert len(documents) <= top_k, "Should not exceed top_k"
+    assert {type(doc['content']) for doc in documents} == {str}
     
-    print(f"✓ Retrieved {results['count']} documents for query")
+    print(f"✓ Retrieved {len(documents)} documents for '{query}'")
 
 
-def test_context_formatting():
-    retriever = Retriever()
-    
-    query = "Tell me about Computer Science programs"
-    context, data = retriever.retrieve_and_format(query, top_k=3)
+def test_context_formatting(retriever, batched_results):
+    context = retriever.format_context(batched_results["programs"])
     
     assert context is not None
     assert len(context) > 0
-    assert "[Context" in context
+    # the formatter opens with the first block marker; no need to scan the whole context
+    assert context.startswith("[Context 1]")
     
     print(f"✓ Context formatted successfully ({len(context)} characters)")
 
 
-def test_relevance_scoring():
-    retriever = Retriever()
-    
-    query = "Computer Science department programs"
-    results = retriever.retrieve(query, top_k=3)
-    
-    distances = results['distances']
+def test_relevance_scoring(batched_results):
+    distances = [doc['distance'] for doc in batched_results["relevance"]]
     assert len(distances) > 0
-    assert all(isinstance(d, (int, float)) for d in distances)
+    assert {type(d) for d in distances} <= {int, float}
     
-    if len(distances) > 1:
-        assert distances[0] <= distances[-1], "Results should be sorted by relevance"
+    # every adjacent pair, not just the endpoints
+    assert np.all(np.diff(np.asarray(distances)) >= 0), "Results should be sorted by relevance"
     
     print(f"✓ Relevance scoring working correctly")
 
 
-if __name__ == "__main__":
-    print("Running RAG tests...\n")
-    print("Note: These tests require the preprocessing pipeline to be run first.\n")
+def test_semantic_cache():
+    cache = SemanticCache(capacity=4, threshold=0.95)
+    rng = np.random.default_rng(0)
+    query = rng.normal(size=64).astype(np.float32)
+    calls = []
     
-    try:
-        test_retriever_initialization()
-        test_retrieval()
-        test_context_formatting()
-        test_relevance_scoring()
+    def search():
+        calls.append(1)
+        return [{'id': f"chunk_{len(calls)}", 'content': "doc"}]
+    
+    first = cache.get_or_compute(query, 3, search)
+    again = cache.get_or_compute(query * 2, 3, search)
+    assert again == first and len(calls) == 1, "Identical direction should hit the cache"
+    
+    cache.get_or_compute(query, 5, search)
+    assert len(calls) == 2, "A larger top_k cannot be served from a smaller cached result"
+    
+    cache.get_or_compute(rng.normal(size=64).astype(np.float32), 3, search)
+    assert len(calls) == 3, "Unrelated queries should miss"
+    
+    print(f"✓ Semantic cache: {cache.hits} hits, {cache.misses} misses")
+
+
+def test_query_embedding_reuse(retriever):
+    calls = []
+    embedder = retriever.embedder
+    
+    class CountingEmbedder:
+        def __getattr__(self, name):
+            return getattr(embedder, name)
         
-        print("\n" + "="*50)
-        print("All RAG tests passed! ✓")
-        print("="*50)
-    except Exception as e:
-        print(f"\n✗ Test failed: {e}")
-        print("\nMake sure to run: python -m backend.preprocessing.run_pipeline")
-        raise
+        def embed_text(self, text):
+            calls.append(text)
+            return embedder.embed_text(text)
+    
+    retriever.embedder = CountingEmbedder()
+    try:
+        query = "Which labs does the Mechanical Engineering department run?"
+        first = retriever.retrieve(query, top_k=3)
+        again = retriever.retrieve(query, top_k=3)
+    finally:
+        retriever.embedder = embedder
+    
+    assert len(calls) == 1, "A repeated query should reuse its embedding"
+    assert [doc['id'] for doc in again] == [doc['id'] for doc in first]
+    
+    print(f"✓ Repeated query served without re-embedding")
+
+
+def test_query_expansion_guard():
+    expansion, where = classify_query("who are the faculty members")
+    assert expansion == "professors", "Terms already in the query should not be repeated"
+    assert where == (("has_faculty", True),)
+    
+    long_query = "what are the admission requirements for the electrical engineering program at uet lahore"
+    expansion, where = classify_query(long_query)
+    assert expansion == "", "Long queries should not be expanded"
+    assert where == (("has_eligibility", True),)
+    
+    print(f"✓ Query expansion guard working")
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-x", "--tb=short", "-q"]))